@@ -1,15 +1,22 @@
 import pydevd_pycharm
 
 from dataclasses import dataclass, field
-from typing import List
+import json
+from time import perf_counter, process_time
+from typing import Any, Dict, List, Optional
 from os import environ
+from os.path import join
 from cocotb.clock import Clock
 from cocotb.handle import HierarchyObject
 from cocotb import start
 from cocotb.triggers import ClockCycles
+from cocotb.utils import get_sim_time
 from cocotb.log import SimLog
 from base_mmc import BaseMMC
 from base_uart_agent import BaseUartAgent, UartConfig
+from trace_recorder import TraceRecorder
+from packet_log import log_summaries
+import coroutine_profile
 from logging import Logger
 
 @dataclass
@@ -36,6 +43,7 @@ class BaseEnvironment:
         self.dut_config: DutConfig = dut_config
         self._uart_agent: BaseUartAgent = self._set_uart_agent(uart_config)
         self._mmc_list: List[BaseMMC] = []
+        self.test_metrics: List[Dict[str, Any]] = []
         self._log: Logger = SimLog("cocotb.%s" % logger_name)
 
     @property
@@ -68,8 +76,7 @@ class BaseEnvironment:
     def _build_env(self) -> None:
         self._dut.in_sig.value = self.dut_config.in_sig
         self._dut.resetCyclic.value = self.dut_config.reset_cyclic
-        self._dut.sipms[0].value = self.dut_config.sipm0
-        self._dut.sipms[1].value = self.dut_config.sipm0
+        self._dut.sipms.value = self.dut_config.sipm1 << 1 | self.dut_config.sipm0
         self._dut.clkMHz.value = self.dut_config.clk_MHz
         self._uart_agent.attach(
             in_sig=self._dut.in_sig,
@@ -92,19 +99,99 @@ class BaseEnvironment:
     def _load_config(self) -> None:
         pass
 
+    def _counters(self) -> Dict[str, int]:
+        """Counters each test is charged the increase of, extend in daughter class"""
+        return dict(
+            tx_packets=self._uart_agent.tx_packets,
+            rx_packets=self._uart_agent.rx_packets,
+            rx_events=self._uart_agent.rx_events,
+        )
+
+    async def _run_test(self, name: str) -> int:
+        """Runs test_dict[name] and records its sim speed, returns its number of FAIL"""
+        counters = self._counters()
+        start_wall, start_cpu, start_sim = perf_counter(), process_time(), get_sim_time(units="ns")
+        test_fail = await self.test_dict[name]()
+        wall_s = perf_counter() - start_wall
+        cpu_s = process_time() - start_cpu
+        sim_ns = get_sim_time(units="ns") - start_sim
+
+        metrics: Dict[str, Any] = dict(
+            environment=type(self).__qualname__,
+            test=name,
+            fail=test_fail,
+            wall_s=wall_s,
+            cpu_s=cpu_s,
+            sim_ns=sim_ns,
+            cycles=int(sim_ns // self.dut_config.clk),
+            sim_ns_per_wall_s=sim_ns / wall_s if wall_s else 0.0,
+        )
+        metrics.update({counter: value - counters[counter] for counter, value in self._counters().items()})
+        self.test_metrics.append(metrics)
+        self._log.info(
+            "%s: %.0f ns of sim time in %.3f s wall, %.3f s cpu, %.0f sim ns per wall s",
+            name, sim_ns, wall_s, cpu_s, metrics["sim_ns_per_wall_s"]
+        )
+        return test_fail
+
+    def _write_metrics(self) -> None:
+        """Appends the metrics of every test run to the VERIF_METRICS JSON lines file"""
+        metrics_file = environ.get("VERIF_METRICS")
+        if not metrics_file:
+            return
+        with open(metrics_file, "a") as metrics_lines:
+            for metrics in self.test_metrics:
+                metrics_lines.write(json.dumps(metrics) + "\n")
+        self.test_metrics.clear()
+
+    def _attach_trace(self, recorder: TraceRecorder) -> None:
+        """Registers every monitor and agent with recorder, extend for the agents of daughter class"""
+        for mmc in self._mmc_list:
+            for monitor in mmc.monitors:
+                monitor.attach_trace(recorder)
+        self._uart_agent.attach_trace(recorder)
+
     async def _test(self, names: List[str] = []):
         raise NotImplementedError("Override this method in daughter class")
 
     async def run(self, names: List[str] = []) -> None:
         self._gen_config()
         self._build_env()
+        # runsim.py --trace
+        trace_dir = environ.get("TRACE_DIR")
+        recorder: Optional[TraceRecorder] = None
+        if trace_dir:
+            recorder = TraceRecorder(join(trace_dir, type(self).__qualname__))
+            self._attach_trace(recorder)
         self._uart_agent.start_uart_rx_listenner()
         for mmc in self._mmc_list:
             mmc.start()
-        await self.reset_dut()
-        self._load_config()
-        await self._test(names=names)
+        # a failing test raises, its traces and reports are the ones needed most
+        try:
+            await self.reset_dut()
+            self._load_config()
+            await self._test(names=names)
+        finally:
+            for mmc in self._mmc_list:
+                mmc.stop()
+            self._uart_agent.stop_uart_rx_listenner()
+            if recorder is not None:
+                recorder.close()
+            self._report_queues()
+            log_summaries()
+            coroutine_profile.report(self._log)
+            self._write_metrics()
+
+    def _report_queues(self) -> None:
+        """Logs how full each monitor queue got, to size MAXSIZE"""
         for mmc in self._mmc_list:
-            mmc.stop()
-        self._uart_agent.stop_uart_rx_listenner()
+            for monitor in mmc.monitors:
+                log = self._log.warning if monitor.dropped else self._log.info
+                log(
+                    "%s: high-water mark %i/%s, %i samples dropped",
+                    monitor.name,
+                    monitor.high_water,
+                    monitor.values.maxsize or "unbounded",
+                    monitor.dropped
+                )
         
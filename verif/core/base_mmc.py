@@ -14,6 +14,7 @@ from cocotb.log import SimLog
 from base_monitor import BaseMonitor
 from logging import Logger
 from base_model import BaseModel
+from coroutine_profile import instrument
 
 class BaseMMC:
     def __init__(self, model: BaseModel, logicblock_instance: SimHandleBase, logger_name: str):
@@ -22,6 +23,7 @@ class BaseMMC:
         self._input_mon, self._output_mon = self._set_monitors()
         self._checkercoro: Optional[Task] = None
         self._log = SimLog("cocotb.MMC.%s" % logger_name)
+        self.name = logger_name
 
     def start(self) -> None:
         """Starts monitors, model, and checker coroutine"""
@@ -29,7 +31,7 @@ class BaseMMC:
             raise RuntimeError("Monitor already started")
         self._input_mon.start()
         self._output_mon.start()
-        self._checkercoro = start_soon(self._checker())
+        self._checkercoro = start_soon(instrument(self._checker(), "%s._checker" % self.name))
 
     def stop(self) -> None:
         """Stops everything"""
@@ -40,6 +42,10 @@ class BaseMMC:
         self._checkercoro.kill()
         self._checkercoro = None
 
+    @property
+    def monitors(self) -> Tuple[BaseMonitor, BaseMonitor]:
+        return self._input_mon, self._output_mon
+
     def _set_monitors(self) -> tuple[BaseMonitor, BaseMonitor]:
         raise NotImplementedError("Override this method in daughter class")
 
@@ -47,4 +53,8 @@ class BaseMMC:
         raise NotImplementedError("Override this method in daughter class")
 
     async def reset(self):
-        raise NotImplementedError("Override this method in daughter class")
+        """Drops the samples taken before the reset, extend in daughter class"""
+        for monitor in self.monitors:
+            drained = monitor.drain()
+            if drained:
+                self._log.info("%s: %i samples drained on reset", monitor.name, drained)
@@ -1,12 +1,10 @@
 from enum import Enum
-from typing import Union, Optional, Tuple
-from bitarray.util import int2ba, ba2int
-from cocotb.triggers import Event, Timer, First
-from cocotb.utils import get_sim_time
+from typing import Optional, Sequence, Tuple
+import numpy as np
 from cocotb.log import SimLog
-
-CRC8_START = 0x0D
-CRC_POLY = 0xC6
+from crc import CRC8_START, CRC_POLY, crc8 as calc_crc8, update as update_crc8
+from register_map import REGISTER_MAP, RegisterBankModel
+from tdc_model import TDCModel
 
 class RegAddr(Enum):
     DATA_MODE = 0x00            # RW
@@ -20,131 +18,53 @@ class RegAddr(Enum):
     CHANNEL_EN_BITS = 0x08      # RW
     PRODUCT_VER_ID = 0x09       # R
 
+# RegAddr keeps the names used by the tests, the register map itself comes from the IP-XACT
+for _reg in RegAddr:
+    if _reg.value >= len(REGISTER_MAP) or REGISTER_MAP.names[_reg.value] is None:
+        raise ValueError("RegAddr.%s is not in the IP-XACT register map" % _reg.name)
+
 class BaseModel():
     def __init__(self) -> None:
         self._current_crc = CRC8_START
-        self._register_bank = {
-            "0x0": 0x00000000,  # RW
-            "0x1": 0x00000000,  # RW
-            "0x2": 0x00000000,  # RW
-            "0x3": 0x00000000,  # RW
-            "0x4": 0x00000000,  # RW
-            "0x5": 0x00000000,  # RW
-            "0x6": 0x00000000,  # R
-            "0x7": 0x00000000,  # W
-            "0x8": 0x00000000,  # RW
-            "0x9": 0xBADEFACE,  # R
-        }
+        self._register_bank = RegisterBankModel()
         self._read_data = 0
+        self.tdc: TDCModel = TDCModel()
         
         self._log = SimLog("cocotb.%s" % type(self).__qualname__)
 
-    def _crc8_single_cycle(self, new_byte):
-        crc = int2ba(self._current_crc, 8)
-        data_bits = int2ba(new_byte, 8)
-        poly = int2ba(CRC_POLY, 8)
-        for j in range(7, -1, -1):
-            if crc[7] != data_bits[j]:
-                crc = (crc >> 1) ^ poly
-            else:
-                crc >>= 1
-        return ba2int(crc)
+    def crc8_update(self, new_byte: int) -> int:
+        """Feeds one byte of the current frame to the running CRC"""
+        self._current_crc = update_crc8(self._current_crc, new_byte)
+        return self._current_crc
 
-    def crc8(self, bytes_array: bytes) -> int:
+    def crc8_check(self, crc: int) -> int:
+        """Compares crc to the running CRC, then restarts it for the next frame"""
+        match = int(self._current_crc == crc)
         self._current_crc = CRC8_START
+        return match
+
+    def crc8(self, bytes_array: bytes) -> int:
         crc = bytes_array[len(bytes_array)-1]
         data = bytes_array[:len(bytes_array)-1]
-
-        # self._log.info(f"bytes received in model = {[hex(byte) for byte in bytes_array]}")
-        # self._log.info(f"data for crc = {[hex(byte) for byte in data]}")
-        # self._log.info(f"crc = {[hex(crc)]}")
-
-        for current_byte in data:
-            self._current_crc = self._crc8_single_cycle(current_byte)
-            # self._log.info(f"current crc = {hex(current_crc)}")
-        if self._current_crc == crc:
+        if calc_crc8(data) == crc:
             return 1
         return 0
 
-    async def tdc(self, i_trig_rising: Event, i_trig_falling: Event) -> tuple[int, int]:
-        while True:
-            await i_trig_rising.wait()
-            rising_timestamp = get_sim_time(units='ps')
-            return await self._tdc_falling_edge_monitoring(
-                rising_timestamp=rising_timestamp,
-                i_trig_rising=i_trig_rising,
-                i_trig_falling=i_trig_falling
-            )
-
-    async def _tdc_falling_edge_monitoring(self, rising_timestamp: int, i_trig_rising: Event, i_trig_falling: Event) -> tuple[int, int]:
-        await i_trig_falling.wait()
-        falling_timestamp = get_sim_time(units='ps')
-
-        pulse_width = falling_timestamp - rising_timestamp
-        if pulse_width < 20*10**3:
-            self._log.info("20ns or less glitch detected")
-            return await self.tdc(
-                i_trig_rising=i_trig_rising,
-                i_trig_falling=i_trig_falling
-            )
-
-        timeout_or_rise: Optional[Union[Timer, Event]] = await First(Timer(19, units='ns'), i_trig_rising.wait())
-
-        # If we waited for 20ns
-        if isinstance(timeout_or_rise, Timer):
-
-            timestamp = rising_timestamp % (40 * (2 ** 32))  # Wrap timestamps @ 171ms
-
-            # Cap pulse width to 50us
-            if pulse_width > 5 * 10 ** 6:
-                pulse_width = 5 * 10 ** 6
-
-            #self._log.info("initial_timestamp = %s", initial_timestamp)
-            #self._log.info("rising_timestamp = %s", rising_timestamp)
-            #self._log.info("falling_timestamp = %s", falling_timestamp)
-
-            #self._log.info("pulse_width = %s", pulse_width)
-            #self._log.info("timestamp = %s", timestamp)
-
-            return (int(pulse_width / 40), int(timestamp / 40))
-        else:
-            self._log.info("20ns or less glitch detected")
-            return await self._tdc_falling_edge_monitoring(
-                rising_timestamp=rising_timestamp,
-                i_trig_rising=i_trig_rising,
-                i_trig_falling=i_trig_falling
-            )
-    
     def register_bank(self, read_enable: int, write_enable: int, address: int, write_data: int = 0) -> Tuple[int, int]:
-        address = RegAddr(address)
         if read_enable == 1 and write_enable == 0:
-            return self._handle_read(address=address)
+            self._read_data = self._register_bank.read(int(address))
+            return (0, self._read_data)
         elif write_enable == 1 and read_enable == 0:
-            return self._handle_write(address=address, write_data=write_data)
+            return (self._register_bank.write(int(address), int(write_data)), self._read_data)
         else:
             raise ValueError('read_enable and write_enable cannot be equal')
-            
-    def _handle_read(self, address: RegAddr) -> Tuple[int, int]:
-        write_ack = 0
-        self._read_data = 0
-        if address not in [RegAddr.CLEAR_SYNC_FLAG]:
-            self._read_data = self._register_bank[hex(address.value)]
-        return (write_ack, self._read_data)
-    
-    def _handle_write(self, address: RegAddr,  write_data: int):
-        write_ack = 0
-        if address in [RegAddr.TDC_THRESH]:
-            self._register_bank[hex(address.value)] = write_data
-            write_ack = 1
-        if address in [RegAddr.EN_COUNT_RATE, RegAddr.EN_EVENT_COUNT_RATE, RegAddr.SRC_SEL, RegAddr.CLEAR_SYNC_FLAG]:
-            self._register_bank[hex(address.value)] = write_data & 0x00000001
-            write_ack = 1
-        if address in [RegAddr.DATA_MODE, RegAddr.BIAS_MODE]:
-            self._register_bank[hex(address.value)] = write_data & 0x00000003
-            write_ack = 1
-        if address in [RegAddr.CHANNEL_EN_BITS]:
-            self._register_bank[hex(address.value)] = write_data & 0x0000FFFF
-            write_ack = 1
-        if address in [RegAddr.SYNC_FLAG_ERR, RegAddr.PRODUCT_VER_ID]:
-            write_ack = 1
-        return (write_ack, self._read_data)
+
+    def register_bank_many(
+        self, read_enable: int, write_enable: int, addresses: Sequence[int], write_data: Optional[Sequence[int]] = None
+    ) -> np.ndarray:
+        """register_bank over a sequence of accesses, returns an (n, 2) array of (writeAck, readData)"""
+        if write_data is None:
+            write_data = [0] * len(addresses)
+        return np.array([
+            self.register_bank(read_enable, write_enable, address, data) for address, data in zip(addresses, write_data)
+        ], dtype=np.int64).reshape(-1, 2)
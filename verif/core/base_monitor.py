@@ -3,30 +3,105 @@
 
 # adapted from https://github.com/cocotb/cocotb/blob/stable/1.9/examples/matrix_multiplier/tests/test_matrix_multiplier.py
 
-from typing import Any, Dict
+from collections import namedtuple
+from enum import Enum
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Type
 
+import numpy as np
 import cocotb
 from cocotb.handle import SimHandleBase
-from cocotb.queue import Queue
+from cocotb.queue import Queue, QueueFull
 from cocotb.triggers import RisingEdge
 from cocotb.log import SimLog
+from trace_recorder import TraceRecorder, TraceStream
+from coroutine_profile import instrument
 
 
+class SampleColumns:
+    """Preallocated int64 columns, one per record field, doubling in size when full"""
+
+    def __init__(self, fields: Tuple[str, ...], capacity: int):
+        self._index: Dict[str, int] = {name: index for index, name in enumerate(fields)}
+        self._data: np.ndarray = np.zeros((capacity, len(fields)), dtype=np.int64)
+        self._count: int = 0
+
+    def append(self, record: Tuple[int, ...]) -> None:
+        if self._count == self._data.shape[0]:
+            self._data = np.resize(self._data, (2 * self._data.shape[0], self._data.shape[1]))
+        self._data[self._count] = record
+        self._count += 1
+
+    def clear(self) -> None:
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """View of every value of one field recorded so far"""
+        return self._data[:self._count, self._index[name]]
+
+
+class OverflowPolicy(Enum):
+    BLOCK = 0           # the monitor waits for the checker to free a slot
+    DROP_OLDEST = 1     # the oldest sample is discarded and counted
+    FAIL = 2            # QueueFull is raised, failing the test
+
 class BaseMonitor:
+    """
+    Args
+        clk: clock signal
+        datas: named handles to be sampled
+        logger_name: name of the logger, under cocotb
+        records: sample into namedtuple records of ints, one field per datas entry,
+            instead of dicts of BinaryValue
+        columns: capacity of the preallocated SampleColumns the records are appended to,
+            instead of the values queue (0 keeps the queue)
+        maxsize: bound of the values queue (0 is unbounded), defaults to MAXSIZE
+        overflow: what to do with a sample when the queue is full, defaults to OVERFLOW
+        gated: data/valid monitors sleep on valid instead of waking up on every clock
+    """
+
+    MAXSIZE: int = 2**16
+    # a sample lost on a full queue would let a test pass unchecked, fail loudly instead
+    OVERFLOW: OverflowPolicy = OverflowPolicy.FAIL
+
+    # names of the traced integers, the record fields by default
+    TRACE_FIELDS: Optional[Tuple[str, ...]] = None
+
     def __init__(
-        self, clk: SimHandleBase, datas: Dict[str, SimHandleBase], logger_name: str
+        self, clk: SimHandleBase, datas: Dict[str, SimHandleBase], logger_name: str,
+        records: bool = False, columns: int = 0,
+        maxsize: Optional[int] = None, overflow: Optional[OverflowPolicy] = None,
+        gated: bool = True
     ):
-        self.values = Queue[Dict[str, int]]()
+        self.name = logger_name
+        self.values = Queue[Dict[str, int]](maxsize=self.MAXSIZE if maxsize is None else maxsize)
+        self.overflow: OverflowPolicy = self.OVERFLOW if overflow is None else overflow
+        self.high_water: int = 0    # largest number of samples the queue held
+        self.dropped: int = 0       # samples discarded by OverflowPolicy.DROP_OLDEST
+        self._trace: Optional[TraceStream] = None
         self._clk = clk
         self._datas = datas
         self._coro = None  # is monitor running? False if "None"
+        self.wakeups: int = 0  # number of times _run resumed
+        self.gated: bool = gated
+
+        # fields are declared once, from the datas names
+        self.record_type: Optional[Type[NamedTuple]] = None
+        self.columns: Optional[SampleColumns] = None
+        if records or columns:
+            self.record_type = namedtuple("%sRecord" % type(self).__name__, datas.keys())
+            self._handles: Tuple[SimHandleBase, ...] = tuple(datas.values())
+        if columns:
+            self.columns = SampleColumns(self.record_type._fields, columns)
 
         self._log = SimLog("cocotb.%s" %  logger_name)
 
     def start(self) -> None:
         if self._coro is not None:
             raise RuntimeError("Monitor already started")
-        self._coro = cocotb.start_soon(self._run())
+        self._coro = cocotb.start_soon(instrument(self._run(), "%s._run" % self.name))
 
     def stop(self) -> None:
         if self._coro is None:
@@ -37,6 +112,70 @@ class BaseMonitor:
     async def _run(self) -> None:
         raise NotImplementedError("Override this method in daughter class")
 
+    def attach_trace(self, recorder: TraceRecorder) -> None:
+        """Records every sample stored from now on"""
+        fields = self.TRACE_FIELDS
+        if fields is None:
+            fields = self.record_type._fields if self.record_type is not None else tuple(self._datas)
+        self._trace = recorder.stream(self.name, fields)
+
+    async def _store(self, sample: Any) -> None:
+        """Appends a sample to the columns in column mode, to the values queue otherwise"""
+        if self._trace is not None:
+            self._trace.record([int(value) for value in sample.values()] if isinstance(sample, dict) else sample)
+
+        if self.columns is not None:
+            self.columns.append(sample)
+            return
+
+        if self.values.full():
+            if self.overflow is OverflowPolicy.BLOCK:
+                await self.values.put(sample)
+                self.high_water = self.values.maxsize
+                return
+            if self.overflow is OverflowPolicy.FAIL:
+                raise QueueFull("%s: values queue full (%i samples)" % (self.name, self.values.maxsize))
+            if self.dropped == 0:
+                self._log.warning("values queue full (%i samples), dropping the oldest ones", self.values.maxsize)
+            self.values.get_nowait()
+            self.dropped += 1
+
+        self.values.put_nowait(sample)
+        if self.values.qsize() > self.high_water:
+            self.high_water = self.values.qsize()
+
+    def drain(self) -> int:
+        """Discards every queued sample, returns how many there were"""
+        count = self.values.qsize()
+        while not self.values.empty():
+            self.values.get_nowait()
+        return count
+
+    async def _run_data_valid(self, valid: SimHandleBase) -> None:
+        """
+        Samples on every rising clock edge where valid is high, meant to be awaited
+        by the _run of data/valid monitors
+        """
+        if not self.gated:
+            while True:
+                await RisingEdge(self._clk)
+                self.wakeups += 1
+                if valid.value.binstr == "1":
+                    await self._store(self._sample())
+
+        while True:
+            # sleep until valid is asserted
+            if valid.value.binstr != "1":
+                await RisingEdge(valid)
+                self.wakeups += 1
+            # then follow the clock only while it stays asserted
+            await RisingEdge(self._clk)
+            self.wakeups += 1
+            while valid.value.binstr == "1":
+                await self._store(self._sample())
+                await RisingEdge(self._clk)
+                self.wakeups += 1
+
     def _sample(self) -> Dict[str, Any]:
         """
         Samples the data signals and builds a transaction object
@@ -47,5 +186,9 @@ class BaseMonitor:
         # self._log.info("use this to print some information at info level")
         # self._log.info({name: hex(handle.value) for name, handle in self._datas.items()})
 
+        # in record mode, every value is converted to int once, here
+        if self.record_type is not None:
+            return self.record_type._make([int(handle.value) for handle in self._handles])
+
         # for loop going through all the values in the signals to sample (see constructor)
         return {name: handle.value for name, handle in self._datas.items()}
@@ -1,51 +1,201 @@
-from typing import List
+from typing import AsyncIterable, Coroutine, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 from dataclasses import dataclass
+from heapq import heappop, heappush, merge
+from itertools import groupby
+from operator import itemgetter
 from cocotb.handle import ModifiableObject
 from cocotb.triggers import Timer
 from base_uart_agent import TDCChannel
 from cocotb.log import SimLog
+from trace_recorder import TraceRecorder, TraceStream
+from coroutine_profile import instrument
 
 @dataclass
 class PulseConfig:
     rise_time: int
     fall_time: int
-    channel: TDCChannel
+    channel: Union[TDCChannel, int]    # any index of the trigger vector
+
+Edge = Tuple[int, int, int]     # (time, level, channel index)
+VectorStep = Tuple[int, int, int]   # (time, mask of channels set, mask of channels cleared)
+
+def pulse_timeline(pulses: Iterable[PulseConfig]) -> List[Edge]:
+    """
+    Every edge of pulses sorted by time, in O(n log n)
+
+    At the same time falls come before rises, so a pulse starting when
+    another one ends on the same channel leaves the trigger high.
+    """
+    timeline: List[Edge] = []
+    for pulse in pulses:
+        channel = pulse.channel.value if isinstance(pulse.channel, TDCChannel) else pulse.channel
+        timeline.append((pulse.rise_time, 1, channel))
+        timeline.append((pulse.fall_time, 0, channel))
+    timeline.sort()
+    return timeline
+
+def _pulse_start(pulse: PulseConfig) -> int:
+    return min(pulse.rise_time, pulse.fall_time)
+
+def merge_pulses(*streams: Iterable[PulseConfig]) -> Iterator[PulseConfig]:
+    """Merges start ordered pulse streams, of one channel each for instance, lazily"""
+    return merge(*streams, key=_pulse_start)
+
+class EdgeQueue:
+    """
+    Turns start ordered pulses into time sorted edges, one pulse at a time
+
+    Only the edges of pulses not over yet are held, so memory is bounded by
+    the pulses overlapping in time rather than by the length of the stream.
+    """
+
+    def __init__(self):
+        self._edges: List[Edge] = []
+        self._start: Optional[int] = None
+
+    def push(self, pulse: PulseConfig) -> List[Edge]:
+        """Queues the edges of pulse, returns the edges before it, now final"""
+        start = _pulse_start(pulse)
+        if self._start is not None and start < self._start:
+            raise ValueError("pulse starting at %i after one starting at %i, streams must be start ordered" % (start, self._start))
+        self._start = start
+        ready: List[Edge] = []
+        # edges at start stay queued, a fall of this pulse at the same time sorts first
+        while self._edges and self._edges[0][0] < start:
+            ready.append(heappop(self._edges))
+        for edge in pulse_timeline((pulse,)):
+            heappush(self._edges, edge)
+        return ready
+
+    def flush(self) -> List[Edge]:
+        """Every edge still queued, in time order"""
+        ready = [heappop(self._edges) for _ in range(len(self._edges))]
+        self._start = None
+        return ready
+
+def stream_timeline(pulses: Iterable[PulseConfig]) -> Iterator[Edge]:
+    """pulse_timeline of start ordered pulses, generated lazily"""
+    queue = EdgeQueue()
+    for pulse in pulses:
+        yield from queue.push(pulse)
+    yield from queue.flush()
+
+def vector_timeline(edges: Iterable[Edge]) -> Iterator[VectorStep]:
+    """Folds time sorted edges into one step per distinct time, a rise wins over a fall"""
+    for time, same_time_edges in groupby(edges, key=itemgetter(0)):
+        set_mask = clear_mask = 0
+        for _, level, channel in same_time_edges:
+            if level:
+                set_mask |= 1 << channel
+            else:
+                clear_mask |= 1 << channel
+        yield time, set_mask, clear_mask
+
+def _channels(mask: int) -> Iterator[int]:
+    channel = 0
+    while mask:
+        if mask & 1:
+            yield channel
+        mask >>= 1
+        channel += 1
 
 class BaseTriggerAgent():
-    def __init__(self, trig: ModifiableObject):
+    """
+    Drives pulses on a trigger vector
+
+    Args
+        trig: the trigger vector, one bit per channel
+        coalesce: writes the whole vector once per distinct edge time, instead
+            of one bit handle per edge, so the GPI writes scale with the edge
+            times rather than with channels x edges
+    """
+
+    def __init__(self, trig: ModifiableObject, coalesce: bool = False):
         self._trig = trig
+        self.coalesce = coalesce
         self._log = SimLog("cocotb.%s" % type(self).__qualname__)
-    async def send_pulses(self, pulses: List[PulseConfig], units: str = "ns") -> None:
-        rise_time_list: List[int] = [pulse.rise_time for pulse in pulses]
-        fall_time_list: List[int] = [pulse.fall_time for pulse in pulses]
+        self._trace: Optional[TraceStream] = None
+        self.edges_driven: int = 0
+        # the vector as last driven, writes only land in ReadWrite so the handle lags behind
+        self._vector: Optional[int] = None
+
+    def attach_trace(self, recorder: TraceRecorder) -> None:
+        """Records every trigger edge driven from now on"""
+        self._trace = recorder.stream("trigger", ("channel", "level"))
+
+    def _driven_vector(self) -> int:
+        """The trigger vector as last driven, read from the handle only the first time"""
+        if self._vector is None:
+            try:
+                self._vector = self._trig.value.integer
+            except ValueError:
+                # X or Z bits, not driven yet
+                self._vector = 0
+        return self._vector
+
+    def _drive(self, channel: int, level: int) -> None:
+        self._trig[channel].value = level
+        if self._vector is not None:
+            self._vector = (self._vector & ~(1 << channel)) | (level << channel)
+        self.edges_driven += 1
+        if self._trace is not None:
+            self._trace.record((channel, level))
+
+    def send_pulses(
+        self, pulses: Union[Iterable[PulseConfig], AsyncIterable[PulseConfig]], units: str = "ns"
+    ) -> Coroutine:
+        """
+        Coroutine driving the pulses, to await or start_soon
+
+        A list or tuple of pulses is sorted first, so may be in any order. Any other
+        iterable, or async iterable, is consumed one pulse at a time, so its pulses
+        must come in order of start (earliest of rise and fall), see merge_pulses.
+        """
+        if hasattr(pulses, "__aiter__"):
+            send = self._send_pulse_stream(pulses, units)
+        elif isinstance(pulses, Sequence) and self.coalesce:
+            # compiled up front, only the vector writes are left to the coroutine
+            send = self._send_vector_timeline(list(vector_timeline(pulse_timeline(pulses))), units)
+        elif isinstance(pulses, Sequence):
+            send = self._send_timeline(pulse_timeline(pulses), units)
+        else:
+            send = self._send_timeline(stream_timeline(pulses), units)
+        return instrument(send, "%s.send_pulses" % type(self).__qualname__)
+
+    async def _send_pulse_stream(self, pulses: AsyncIterable[PulseConfig], units: str) -> None:
+        queue = EdgeQueue()
         gen_time = 0
-        while len(fall_time_list) > 0:
-            min_fall: int = min(fall_time_list)
-            if len(rise_time_list) > 0:
-                min_rise: int = min(rise_time_list)
-            else:
-                min_rise = min(fall_time_list)+1
-            
-            await Timer(min([min_fall, min_rise])-gen_time, units=units)
-            gen_time = min([min_fall, min_rise])
-            if min_rise < min_fall:
-                for pulse in pulses:
-                    if pulse.rise_time == min_rise:
-                        self._trig[pulse.channel.value].value = 1
-                rise_time_list.remove(min_rise)
-            if min_fall < min_rise:
-                for pulse in pulses:
-                    if pulse.fall_time == min_fall:
-                        self._trig[pulse.channel.value].value = 0
-                fall_time_list.remove(min_fall)
-            if min_fall == min_rise:
-                for pulse in pulses:
-                    if pulse.fall_time == min_fall:
-                        self._trig[pulse.channel.value].value = 0
-                    if pulse.rise_time == min_rise:
-                        self._trig[pulse.channel.value].value = 1
-                fall_time_list.remove(min_fall)
-                rise_time_list.remove(min_rise)
+        async for pulse in pulses:
+            gen_time = await self._send_timeline(queue.push(pulse), units, gen_time)
+        await self._send_timeline(queue.flush(), units, gen_time)
+
+    async def _send_timeline(self, edges: Iterable[Edge], units: str, gen_time: int = 0) -> int:
+        """Drives time sorted edges, all the edges of a timestamp in one step, returns the time reached"""
+        if self.coalesce:
+            return await self._send_vector_timeline(vector_timeline(edges), units, gen_time)
+        for time, same_time_edges in groupby(edges, key=itemgetter(0)):
+            if time > gen_time:
+                await Timer(time - gen_time, units=units)
+                gen_time = time
+            for _, level, channel in same_time_edges:
+                self._drive(channel, level)
+        return gen_time
+
+    async def _send_vector_timeline(self, steps: Iterable[VectorStep], units: str, gen_time: int = 0) -> int:
+        """Drives the steps of vector_timeline, one write of the trigger vector each, returns the time reached"""
+        for time, set_mask, clear_mask in steps:
+            if time > gen_time:
+                await Timer(time - gen_time, units=units)
+                gen_time = time
+            self._vector = (self._driven_vector() & ~clear_mask) | set_mask
+            self._trig.value = self._vector
+            self.edges_driven += bin(set_mask).count("1") + bin(clear_mask).count("1")
+            if self._trace is not None:
+                for channel in _channels(clear_mask):
+                    self._trace.record((channel, 0))
+                for channel in _channels(set_mask):
+                    self._trace.record((channel, 1))
+        return gen_time
     
     def reset(self):
         return
@@ -1,39 +1,119 @@
-from typing import Optional, Union, List
+from typing import Optional, Union, List, Tuple, Hashable, Iterable, Deque, Sequence
+from collections import OrderedDict, deque
+from dataclasses import dataclass
 from enum import Enum
+from logging import Logger
+import numpy as np
 from cocotbext.uart import UartSource, UartSink
 from cocotb.handle import ModifiableObject
 from cocotb import start, Coroutine, Task, start_soon
-from cocotb.binary import BinaryValue
-from bitarray.util import int2ba, ba2int
-from cocotb.triggers import ClockCycles
+from cocotb.triggers import ClockCycles, First, Timer
+from cocotb.utils import get_sim_time
 from cocotb.log import SimLog
 from cocotb.queue import Queue
-from uart_packets import UartRxPckt, UartTxPckt, UartTxCmd, UartConfig, UartRxType
+from uart_packets import UartRxPckt, UartTxPckt, UartTxCmd, UartConfig, UartRxType, byteorder
 from base_model import RegAddr
+from crc import crc8
+from packet_log import PacketLog
+from coroutine_profile import instrument
+from trace_recorder import TraceRecorder, TraceStream
 
 class TDCChannel(Enum):
     CHAN0 = 0x0
     CHAN1 = 0x1
 
-CRC8_START = 0x0D
-CRC_POLY = 0xC6
+class UartTransactionError(Enum):
+    NACK = 0x0
+    ORDER = 0x1     # response type does not match the oldest outstanding request
+    TIMEOUT = 0x2
+    ABORTED = 0x3   # not sent, or left unanswered, after an earlier timeout of the batch
+
+@dataclass
+class UartTransaction:
+    cmd: UartTxCmd
+    addr: RegAddr
+    data: int = 0
+    response: Optional[UartRxPckt] = None
+    latency: Optional[int] = None   # ns, from the frame being queued to its response
+    error: Optional[UartTransactionError] = None
+
+EXPECTED_RESPONSE = {
+    UartTxCmd.READ: UartRxType.ACK_READ,
+    UartTxCmd.WRITE: UartRxType.ACK_WRITE,
+}
+
+# Rows of write_many and read_many, type and latency are -1 when no response came
+RESULT_DTYPE = np.dtype([("addr", "<i8"), ("type", "<i8"), ("data", "<i8"), ("latency", "<i8")])
+
+def result_table(transactions: Sequence[UartTransaction]) -> np.ndarray:
+    """One RESULT_DTYPE row per transaction"""
+    return np.array([
+        (
+            tr.addr.value,
+            tr.response.type.value if tr.response is not None else -1,
+            tr.response.data if tr.response is not None else 0,
+            tr.latency if tr.latency is not None else -1,
+        )
+        for tr in transactions
+    ], dtype=RESULT_DTYPE)
+
+def _type_name(value: int) -> str:
+    return UartRxType(value).name if value >= 0 else "TIMEOUT"
+
+def diff_results(results: np.ndarray, cmd: UartTxCmd, predicted: np.ndarray, log: Logger) -> int:
+    """
+    Compares a result table to the (writeAck, readData) of BaseModel.register_bank_many
+    in one pass, logs every row that differs and returns their number
+    """
+    if cmd == UartTxCmd.WRITE:
+        # the CommandManager acknowledges writes with a null data
+        expected_type = np.where(predicted[:, 0] == 1, UartRxType.ACK_WRITE.value, UartRxType.NACK.value)
+        expected_data = np.zeros(len(predicted), dtype=np.int64)
+    else:
+        expected_type = np.full(len(predicted), UartRxType.ACK_READ.value)
+        expected_data = predicted[:, 1]
+    wrong = np.flatnonzero((results["type"] != expected_type) | (results["data"] != expected_data))
+    for row in wrong.tolist():
+        log.error(
+            "%s %s: expected %s data = %#x, but got %s data = %#x",
+            cmd, RegAddr(int(results["addr"][row])), _type_name(int(expected_type[row])), int(expected_data[row]),
+            _type_name(int(results["type"][row])), int(results["data"][row])
+        )
+    return len(wrong)
 
 class BaseUartAgent:
     def __init__(
         self,
         uart_config: UartConfig,
+        frame_cache_size: int = 256,
     ):
         self.uart_config = uart_config
         self._uart_source: Optional[UartSource] = None
         self._uart_sink: Optional[UartSink] = None
         self._dut_clk: Optional[ModifiableObject] = None
         self._log = SimLog("cocotb.%s" % type(self).__qualname__)
+        self._packet_log = PacketLog("%s.packets" % type(self).__qualname__)
 
         self._tdc_queue: Queue[UartRxPckt] = Queue()
         self._reg_queue: Queue[UartRxPckt] = Queue()
         
         self._uart_rx_listenner: Optional[Task] = None
 
+        # Fully encoded frames (payload and crc8 byte), least recently used first
+        self._frame_cache: OrderedDict[Hashable, Tuple[UartTxPckt, bytes]] = OrderedDict()
+        self._frame_cache_size: int = frame_cache_size
+        self.frame_cache_hits: int = 0
+        self.frame_cache_misses: int = 0
+
+        self._tx_trace: Optional[TraceStream] = None
+        self._rx_trace: Optional[TraceStream] = None
+
+        self.tx_packets: int = 0
+        self.rx_packets: int = 0
+        self.rx_events: int = 0     # TDC EVENT packets, included in rx_packets
+        self.rx_wakeups: int = 0
+        self.last_wait_ns: int = 0  # sim time spent in the last response wait
+
     @property
     def uart_config(self) -> UartConfig:
         if self._uart_config is None:
@@ -47,18 +127,33 @@ class BaseUartAgent:
         self._uart_config = uart_config
 
     def _calc_crc8(self, bytes_array: bytes) -> int:
-        current_crc = CRC8_START
-        for byte in bytes_array:
-            crc = int2ba(current_crc, 8)
-            data_bits = int2ba(byte, 8)
-            poly = int2ba(CRC_POLY, 8)
-            for j in range(7, -1, -1):
-                if crc[7] != data_bits[j]:
-                    crc = (crc >> 1) ^ poly
-                else:
-                    crc >>= 1
-            current_crc = ba2int(crc)
-        return current_crc
+        return crc8(bytes_array)
+
+    def _frame_key(self, cmd: UartTxCmd, addr: RegAddr, data: int) -> Hashable:
+        """Everything the encoded frame depends on, extended by agents altering the crc8"""
+        return (cmd, addr, data)
+
+    def _encode_frame(self, cmd: UartTxCmd, addr: RegAddr, data: int) -> Tuple[UartTxPckt, bytes]:
+        key = self._frame_key(cmd, addr, data)
+        entry = self._frame_cache.get(key)
+        if entry is not None:
+            self._frame_cache.move_to_end(key)
+            self.frame_cache_hits += 1
+            return entry
+
+        self.frame_cache_misses += 1
+        tx_pkt: UartTxPckt = UartTxPckt(
+            cmd=cmd,
+            addr=addr,
+            data=data,
+            uart_config=self.uart_config
+        )
+        raw_crc8 = self._calc_crc8(tx_pkt.buff)
+        frame = tx_pkt.buff + raw_crc8.to_bytes(self.uart_config.frame_size // 8, byteorder(self.uart_config))
+        self._frame_cache[key] = (tx_pkt, frame)
+        if len(self._frame_cache) > self._frame_cache_size:
+            self._frame_cache.popitem(last=False)
+        return (tx_pkt, frame)
 
     def attach(self, in_sig: ModifiableObject, out_sig: ModifiableObject, dut_clk: ModifiableObject) -> None:
         self._uart_source = UartSource(
@@ -73,107 +168,247 @@ class BaseUartAgent:
         )
         self._dut_clk = dut_clk
 
-    async def transaction(self, cmd: UartTxCmd, addr: RegAddr, data: int = 0, timeout_cycles: int = 1000, retries: int = 60) -> UartRxPckt:
-        response: Coroutine = await start(self._wait_for_response(timeout_cycles, retries))
+    def attach_trace(self, recorder: TraceRecorder) -> None:
+        """Records every packet sent and received from now on"""
+        self._tx_trace = recorder.stream("uart_tx", ("cmd", "addr", "data"))
+        self._rx_trace = recorder.stream("uart_rx", ("type", "res1", "num", "chan", "res0", "data"))
 
-        tx_pkt: BinaryValue = UartTxPckt(
-            cmd=cmd,
-            addr=addr,
-            data=data,
-            uart_config=self.uart_config
-        )
-        self._log.info("Preparing to send message:")
-        tx_pkt.log_pkt()
+    async def _send(self, tx_pkt: UartTxPckt, frame: bytes) -> None:
+        self.tx_packets += 1
+        if self._tx_trace is not None:
+            self._tx_trace.record((tx_pkt.cmd.value, tx_pkt.addr.value, tx_pkt.data))
+        await self._uart_source.write(frame)
 
-        await self._uart_source.write(tx_pkt.buff)
-        await self._uart_source.wait()
+    async def transaction(
+        self,
+        cmd: UartTxCmd,
+        addr: RegAddr,
+        data: int = 0,
+        timeout_cycles: int = 60000,
+        timeout_time: Optional[int] = None,
+        timeout_units: str = "ns"
+    ) -> Optional[UartRxPckt]:
+        """Sends one command and waits for its response, timeout_time overrides timeout_cycles"""
+        response: Coroutine = await start(self._wait_for_response(timeout_cycles, timeout_time, timeout_units))
 
-        raw_crc8 = self._calc_crc8(tx_pkt.buff)
-        crc8_pkt = BinaryValue(
-            value=raw_crc8,
-            n_bits=self._uart_config.frame_size,
-            bigEndian=self._uart_config.big_endian
-        )
-        await self._uart_source.write(crc8_pkt.buff)
+        tx_pkt, frame = self._encode_frame(cmd=cmd, addr=addr, data=data)
+        self._packet_log.packet("tx", "%s", tx_pkt)
+
+        await self._send(tx_pkt, frame)
         # self._uart_source.clear()
         # self._uart_sink.clear()
         rx_pkt: UartRxPckt = await response
         return rx_pkt
 
-    async def _wait_for_response(self, timeout_cycles: int, retries: int) -> Union[UartRxPckt, None]:
-        try_counter = 1
-        while (try_counter < retries) and (self._reg_queue.qsize() < 1):
+    async def transaction_batch(
+        self,
+        transactions: Iterable[UartTransaction],
+        window: int = 4,
+        timeout_cycles: int = 60000,
+        timeout_time: Optional[int] = None,
+        timeout_units: str = "ns"
+    ) -> List[UartTransaction]:
+        """
+        Sends transactions back to back, keeping up to window requests outstanding
+
+        Responses are matched to requests in FIFO order. Each transaction is returned
+        with its response, latency and error, if any. A timeout aborts the batch: the
+        rest is marked ABORTED and late responses are drained, not matched.
+        """
+        transactions = list(transactions)
+        outstanding: Deque[Tuple[UartTransaction, int]] = deque()
+        next_to_send = 0
+        while next_to_send < len(transactions) or outstanding:
+            while next_to_send < len(transactions) and len(outstanding) < window:
+                tr = transactions[next_to_send]
+                tx_pkt, frame = self._encode_frame(cmd=tr.cmd, addr=tr.addr, data=tr.data)
+                await self._send(tx_pkt, frame)
+                outstanding.append((tr, round(get_sim_time(units='ns'))))
+                next_to_send += 1
+
+            deadline: Task = start_soon(self._deadline(timeout_cycles, timeout_time, timeout_units))
+            response: Optional[UartRxPckt] = await self._get_before(self._reg_queue, deadline)
+            deadline.kill()
+            tr, sent_time = outstanding.popleft()
+            if response is None:
+                tr.error = UartTransactionError.TIMEOUT
+                self._log.error("%s %s: timeout", tr.cmd, tr.addr)
+                # a late response would be matched to the next request, stop here
+                aborted = [pending for pending, _ in outstanding] + transactions[next_to_send:]
+                for pending in aborted:
+                    pending.error = UartTransactionError.ABORTED
+                if aborted:
+                    self._log.error("Batch aborted, %i transactions left without a response", len(aborted))
+                await self._drain_late_responses(timeout_cycles, timeout_time, timeout_units)
+                break
+
+            tr.response = response
+            tr.latency = round(get_sim_time(units='ns')) - sent_time
+            if response.type == UartRxType.NACK:
+                tr.error = UartTransactionError.NACK
+                self._log.error("%s %s: NACK received", tr.cmd, tr.addr)
+            elif response.type != EXPECTED_RESPONSE[tr.cmd]:
+                tr.error = UartTransactionError.ORDER
+                self._log.error("%s %s: received %s out of order", tr.cmd, tr.addr, response.type)
+        return transactions
+
+    async def write_many(
+        self,
+        addrs: Sequence[Union[RegAddr, int]],
+        data: Sequence[int],
+        window: int = 4,
+        timeout_cycles: int = 60000,
+        timeout_time: Optional[int] = None,
+        timeout_units: str = "ns"
+    ) -> np.ndarray:
+        """Writes data[i] to addrs[i] back to back, returns one RESULT_DTYPE row per write"""
+        if len(addrs) != len(data):
+            raise ValueError("%i addresses for %i data" % (len(addrs), len(data)))
+        transactions = await self.transaction_batch(
+            (UartTransaction(cmd=UartTxCmd.WRITE, addr=RegAddr(addr), data=int(value)) for addr, value in zip(addrs, data)),
+            window, timeout_cycles, timeout_time, timeout_units
+        )
+        return result_table(transactions)
+
+    async def read_many(
+        self,
+        addrs: Sequence[Union[RegAddr, int]],
+        window: int = 4,
+        timeout_cycles: int = 60000,
+        timeout_time: Optional[int] = None,
+        timeout_units: str = "ns"
+    ) -> np.ndarray:
+        """Reads addrs back to back, returns one RESULT_DTYPE row per read"""
+        transactions = await self.transaction_batch(
+            (UartTransaction(cmd=UartTxCmd.READ, addr=RegAddr(addr)) for addr in addrs),
+            window, timeout_cycles, timeout_time, timeout_units
+        )
+        return result_table(transactions)
+
+    async def _deadline(self, timeout_cycles: int, timeout_time: Optional[int], timeout_units: str) -> None:
+        if timeout_time is not None:
+            await Timer(timeout_time, units=timeout_units)
+        else:
             await ClockCycles(self._dut_clk, timeout_cycles, rising=True)
-            try_counter += 1
 
-        if try_counter == retries:
-            self._log.error(
-                "Timeout after a wait of %d clock cycles",
-                int(timeout_cycles * retries)
-            )
+    async def _drain_late_responses(self, timeout_cycles: int, timeout_time: Optional[int], timeout_units: str) -> int:
+        """Discards the responses still coming in until a full timeout passes without any, returns their number"""
+        drained = 0
+        while True:
+            deadline: Task = start_soon(self._deadline(timeout_cycles, timeout_time, timeout_units))
+            pkt: Optional[UartRxPckt] = await self._get_before(self._reg_queue, deadline)
+            deadline.kill()
+            if pkt is None:
+                return drained
+            drained += 1
+            self._log.warning("Discarded late response %s", pkt)
+
+    async def _get_before(self, queue: Queue[UartRxPckt], deadline: Task) -> Optional[UartRxPckt]:
+        """Returns the next packet of queue as soon as it arrives, or None once deadline is done"""
+        if not queue.empty():
+            return queue.get_nowait()
+        if deadline.done():
+            return None
+        # First only takes triggers and tasks, not a bare coroutine
+        getter: Task = start_soon(queue.get())
+        await First(getter, deadline)
+        if getter.done():
+            return getter.result()
+        # the deadline won, a getter left waiting would swallow the next packet
+        getter.kill()
+        return None
+
+    def _timeout_str(self, timeout_cycles: int, timeout_time: Optional[int], timeout_units: str) -> str:
+        if timeout_time is not None:
+            return "%i %s" % (timeout_time, timeout_units)
+        return "%i clock cycles" % timeout_cycles
+
+    async def _wait_for_response(self, timeout_cycles: int, timeout_time: Optional[int], timeout_units: str) -> Union[UartRxPckt, None]:
+        start_time = round(get_sim_time(units='ns'))
+        deadline: Task = start_soon(self._deadline(timeout_cycles, timeout_time, timeout_units))
+        pkt: Optional[UartRxPckt] = await self._get_before(self._reg_queue, deadline)
+        deadline.kill()
+
+        self.last_wait_ns = round(get_sim_time(units='ns')) - start_time
+        if pkt is None:
+            self._log.error("Timeout after a wait of %s", self._timeout_str(timeout_cycles, timeout_time, timeout_units))
             return None
             # raise RuntimeError("Timeout after a wait of %d clock cycles", int(timeout_cycles * retries)")
 
-        self._log.info("After a wait of %s clock cycles, received message:", str(timeout_cycles * try_counter))
-        pkt: UartRxPckt = await self._reg_queue.get()
-        pkt.log_pkt()
+        self._packet_log.packet("rx", "after %i ns: %s", self.last_wait_ns, pkt)
 
         return pkt
 
-    async def tdc_transaction(self, num_events: int = 1, timeout_cycles: int = 1000, retries: int = 60) -> List[UartRxPckt]:
-        response: Coroutine = await start(self._wait_for_tdc(num_events, timeout_cycles, retries))
+    async def tdc_transaction(
+        self,
+        num_events: int = 1,
+        timeout_cycles: int = 60000,
+        timeout_time: Optional[int] = None,
+        timeout_units: str = "ns"
+    ) -> List[UartRxPckt]:
+        """Waits for num_events TDC packets, timeout_time overrides timeout_cycles"""
+        response: Coroutine = await start(self._wait_for_tdc(num_events, timeout_cycles, timeout_time, timeout_units))
         rx_pkts: List[UartRxPckt] = await response
         return rx_pkts
 
-    async def _wait_for_tdc(self, num_of_events: int, timeout_cycles: int, retries: int ) -> List[UartRxPckt]:
+    async def _wait_for_tdc(self, num_of_events: int, timeout_cycles: int, timeout_time: Optional[int], timeout_units: str) -> List[UartRxPckt]:
         pkts: List[UartRxPckt] = []
-        try_counter = 1
-        while (len(pkts) < num_of_events) and (try_counter <  retries):
-            tdc_queue_size = self._tdc_queue.qsize()
-            if tdc_queue_size > 0:
-                pkts.append(await self._tdc_queue.get())
-            else:
-                await ClockCycles(self._dut_clk, timeout_cycles, rising=True)
-                try_counter += 1
-        
+        start_time = round(get_sim_time(units='ns'))
+        deadline: Task = start_soon(self._deadline(timeout_cycles, timeout_time, timeout_units))
+        while len(pkts) < num_of_events:
+            pkt: Optional[UartRxPckt] = await self._get_before(self._tdc_queue, deadline)
+            if pkt is None:
+                break
+            pkts.append(pkt)
+        deadline.kill()
+
+        self.last_wait_ns = round(get_sim_time(units='ns')) - start_time
         #self._log.info("Nb of received event from TDC: %s ", str(len(pkts)))
 
-        if try_counter == retries:
+        if len(pkts) < num_of_events:
             self._log.error(
-                "Timeout after a wait of %d clock cycles",
-                int(timeout_cycles * retries)
+                "Timeout after a wait of %s, received %i of %i events",
+                self._timeout_str(timeout_cycles, timeout_time, timeout_units), len(pkts), num_of_events
             )
             return pkts
 
-        #self._log.info("After a wait of %s clock cycles, received message(s):", str(timeout_cycles * try_counter))
+        #self._log.info("After a wait of %i ns, received message(s):", self.last_wait_ns)
         #for pkt in pkts:
         #    pkt.log_pkt()
 
         return pkts
 
     async def _listen_uart_rx(self) -> None:
+        """Sleeps until the sink receives a byte, then drains every complete packet"""
         nb_bytes_expected = int(self.uart_config.packet_size / self._uart_config.frame_size)
         while(True):
-            while self._uart_sink.count() < nb_bytes_expected:
-                await ClockCycles(self._dut_clk, num_cycles=1, rising=True)
-            pkt_bytes = bytes(await self._uart_sink.read(count=nb_bytes_expected))
-            await self._uart_sink.read(count=1) # crc8 byte
-            pkt: UartRxPckt = UartRxPckt(
-                rx_pkt_bytes=pkt_bytes,
-                uart_config=self.uart_config
-            )
-            if pkt.type == UartRxType.EVENT:
-                pkt.log_pkt()
-                
-                await self._tdc_queue.put(pkt)
-            else:
-                await self._reg_queue.put(pkt)
-    
+            while self._uart_sink.count() < nb_bytes_expected + 1:
+                self._uart_sink.sync.clear()
+                await self._uart_sink.sync.wait()
+                self.rx_wakeups += 1
+            while self._uart_sink.count() >= nb_bytes_expected + 1:
+                pkt_bytes = bytes(self._uart_sink.read_nowait(count=nb_bytes_expected))
+                self._uart_sink.read_nowait(count=1) # crc8 byte
+                pkt: UartRxPckt = UartRxPckt(
+                    rx_pkt_bytes=pkt_bytes,
+                    uart_config=self.uart_config
+                )
+                self.rx_packets += 1
+                if self._rx_trace is not None:
+                    self._rx_trace.record((pkt.type.value, pkt.res1, pkt.num, pkt.chan, pkt.res0, pkt.data))
+                if pkt.type == UartRxType.EVENT:
+                    self.rx_events += 1
+                    self._packet_log.packet("rx.EVENT", "%s", pkt)
+
+                    self._tdc_queue.put_nowait(pkt)
+                else:
+                    self._reg_queue.put_nowait(pkt)
+
     def start_uart_rx_listenner(self) -> None:
         """Starts listen_uart_rx coroutine"""
         if self._uart_rx_listenner is not None:
             raise RuntimeError("Monitor already started")
-        self._uart_rx_listenner = start_soon(coro=self._listen_uart_rx())
+        self._uart_rx_listenner = start_soon(instrument(self._listen_uart_rx(), "%s._listen_uart_rx" % type(self).__qualname__))
 
     def stop_uart_rx_listenner(self) -> None:
         """Stops listen_uart_rx coroutine"""
@@ -0,0 +1,75 @@
+import json
+from dataclasses import asdict, dataclass, field
+from logging import Logger
+from os import environ
+from time import process_time
+from typing import Any, Coroutine, Dict, Optional
+
+# runsim.py --profile, path of the JSON report, profiling is off if empty
+PROFILE_FILE: Optional[str] = environ.get("VERIF_PROFILE") or None
+
+@dataclass
+class CoroutineStats:
+    wakeups: int = 0
+    cpu_s: float = 0.0
+    triggers: Dict[str, int] = field(default_factory=dict)  # trigger type -> times awaited
+
+_stats: Dict[str, CoroutineStats] = {}
+
+def instrument(coro: Coroutine, name: str) -> Coroutine:
+    """
+    Wraps coro to count its wake-ups, CPU time and awaited triggers under name
+
+    Returns coro itself when profiling is off, so it costs one call per coroutine started.
+    """
+    if PROFILE_FILE is None:
+        return coro
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats[name] = CoroutineStats()
+    return _instrumented(coro, stats)
+
+async def _instrumented(coro: Coroutine, stats: CoroutineStats) -> Any:
+    """Steps coro by hand, handing every trigger it yields back to the scheduler"""
+    send_value: Any = None
+    exception: Optional[BaseException] = None
+    while True:
+        start = process_time()
+        try:
+            if exception is None:
+                trigger = coro.send(send_value)
+            else:
+                trigger = coro.throw(exception)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            stats.cpu_s += process_time() - start
+            stats.wakeups += 1
+
+        trigger_type = type(trigger).__name__
+        stats.triggers[trigger_type] = stats.triggers.get(trigger_type, 0) + 1
+        exception = None
+        try:
+            send_value = await trigger
+        except GeneratorExit:
+            # killed, the wrapped coroutine goes with it
+            coro.close()
+            raise
+        except BaseException as error:
+            exception = error
+
+def report(log: Logger) -> None:
+    """Logs the coroutines ranked by CPU time, writes them to PROFILE_FILE, then starts over"""
+    if PROFILE_FILE is None:
+        return
+    ranked = sorted(_stats.items(), key=lambda item: item[1].cpu_s, reverse=True)
+    log.info("%-48s %10s %10s %12s  %s", "coroutine", "wake-ups", "cpu (s)", "us/wake-up", "triggers")
+    for name, stats in ranked:
+        log.info(
+            "%-48s %10i %10.3f %12.2f  %s",
+            name, stats.wakeups, stats.cpu_s, 1e6 * stats.cpu_s / max(stats.wakeups, 1),
+            ", ".join("%s: %i" % trigger for trigger in sorted(stats.triggers.items(), key=lambda t: -t[1]))
+        )
+    with open(PROFILE_FILE, "w") as profile_file:
+        json.dump({name: asdict(stats) for name, stats in ranked}, profile_file, indent=2)
+    _stats.clear()
@@ -0,0 +1,63 @@
+from typing import Iterable, List
+
+import numpy as np
+
+CRC8_START = 0x0D
+CRC_POLY = 0xC6
+
+
+def _build_table(poly: int) -> List[int]:
+    """Precomputes the next CRC state for every possible (state ^ byte) value.
+
+    The RTL shifts each byte LSB first into a right-shifting register, so one
+    table lookup replaces the eight conditional shift/xor steps of a byte.
+    """
+    table: List[int] = []
+    for index in range(256):
+        crc = index
+        for _ in range(8):
+            if crc & 0x01:
+                crc = (crc >> 1) ^ poly
+            else:
+                crc >>= 1
+        table.append(crc)
+    return table
+
+
+CRC8_TABLE: List[int] = _build_table(CRC_POLY)
+
+
+def update(state: int, byte: int) -> int:
+    """Feeds a single byte to a running CRC state and returns the new state"""
+    return CRC8_TABLE[state ^ byte]
+
+
+def crc8(data: Iterable[int], state: int = CRC8_START) -> int:
+    """Computes the CRC-8 of data, starting from state"""
+    table = CRC8_TABLE
+    for byte in data:
+        state = table[state ^ byte]
+    return state
+
+
+def corrupt(crc: int, offset: int) -> int:
+    """Applies a deliberate offset to a CRC byte, used to inject CRC errors"""
+    return (crc + offset) & 0xFF
+
+
+
+def crc8_batch(frames: np.ndarray, lengths: np.ndarray, state: int = CRC8_START) -> np.ndarray:
+    """Computes the CRC-8 of many frames at once.
+
+    frames is a (n_frames, max_len) uint8 array, only the first lengths[i]
+    bytes of row i are fed to its CRC. The loop runs over byte columns, so the
+    cost grows with the longest frame, not with the number of frames.
+    """
+    table = np.asarray(CRC8_TABLE, dtype=np.uint8)
+    crcs = np.full(frames.shape[0], state, dtype=np.uint8)
+    for column in range(frames.shape[1]):
+        active = lengths > column
+        if not active.any():
+            break
+        crcs = np.where(active, table[crcs ^ frames[:, column]], crcs)
+    return crcs
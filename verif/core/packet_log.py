@@ -0,0 +1,58 @@
+from enum import IntEnum
+from logging import Logger
+from os import environ
+from typing import Any, Dict, Optional
+from weakref import WeakSet
+
+from cocotb.log import SimLog
+
+class Verbosity(IntEnum):
+    QUIET = 0   # no packet records, only the suppressed counts
+    NORMAL = 1  # the first BURST records of each category, then one in SAMPLE
+    FULL = 2    # every packet record
+
+# runsim.py --verbosity
+VERBOSITY: Verbosity = Verbosity[environ.get("VERIF_VERBOSITY", "normal").upper()]
+BURST = 20
+SAMPLE = 100
+
+_packet_logs: "WeakSet[PacketLog]" = WeakSet()
+
+class PacketLog:
+    """
+    One line records of packets, rate limited per category
+
+    The arguments are only formatted, by logging, for records actually emitted,
+    so pass packets as is rather than hex() or str() of their fields.
+    """
+
+    def __init__(self, name: str, verbosity: Optional[Verbosity] = None, burst: int = BURST, sample: int = SAMPLE):
+        self._log: Logger = SimLog("cocotb.%s" % name)
+        self.verbosity: Verbosity = VERBOSITY if verbosity is None else verbosity
+        self._burst = burst
+        self._sample = sample
+        self._counts: Dict[str, int] = {}
+        self.suppressed: Dict[str, int] = {}
+        _packet_logs.add(self)
+
+    def packet(self, category: str, msg: str, *args: Any) -> None:
+        count = self._counts.get(category, 0) + 1
+        self._counts[category] = count
+        if self.verbosity is Verbosity.FULL or (
+            self.verbosity is Verbosity.NORMAL and (count <= self._burst or count % self._sample == 0)
+        ):
+            self._log.info("%s " + msg, category, *args)
+        else:
+            self.suppressed[category] = self.suppressed.get(category, 0) + 1
+
+    def summary(self) -> None:
+        """Logs how many records of each category were suppressed, then starts over"""
+        for category, suppressed in self.suppressed.items():
+            self._log.info("%s: %i of %i records suppressed", category, suppressed, self._counts[category])
+        self._counts.clear()
+        self.suppressed.clear()
+
+
+def log_summaries() -> None:
+    for packet_log in _packet_logs:
+        packet_log.summary()
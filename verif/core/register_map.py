@@ -0,0 +1,120 @@
+from dataclasses import dataclass, field
+from enum import Enum
+from os import environ
+from os.path import abspath, dirname, join
+from typing import Dict, List, Optional, Tuple
+from xml.etree import ElementTree
+
+SPIRIT_NS = {"spirit": "http://www.spiritconsortium.org/XMLSchema/SPIRIT/1.5"}
+
+REGISTERS_XML = join(
+    environ.get("DESIGN_ROOT", join(dirname(abspath(__file__)), "..", "..", "design")),
+    "digital", "Registers", "ipxact", "registers.xml"
+)
+
+class RegAccess(Enum):
+    RW = 0
+    R = 1   # writes are acknowledged but ignored
+    W = 2   # reads return 0
+
+IPXACT_ACCESS = {
+    "read-write": RegAccess.RW,
+    "read-only": RegAccess.R,
+    "write-only": RegAccess.W,
+    "writeOnce": RegAccess.RW,
+    "read-writeOnce": RegAccess.RW,
+}
+
+# Hand edits of registers_sv_pkg.sv (see ipxact/additionnal_registers_function)
+# which the IP-XACT description does not carry.
+REGISTER_OVERRIDES: Dict[str, Dict[str, object]] = {
+    "DisableFlagSync": dict(access=RegAccess.W),  # strobe, cleared after writeAck
+    "ActiveChannels": dict(reset=0x0),            # ActiveChannels_reset_value = 16'h0
+    "ProductKey": dict(access=RegAccess.R),       # not in write_registers()
+}
+
+@dataclass
+class RegisterMap:
+    """Register map flattened into lists indexed by integer address"""
+    names: List[Optional[str]] = field(default_factory=list)
+    access: List[Optional[RegAccess]] = field(default_factory=list)
+    masks: List[int] = field(default_factory=list)
+    resets: List[int] = field(default_factory=list)
+
+    @classmethod
+    def from_ipxact(cls, path: str = REGISTERS_XML, overrides: Dict[str, Dict[str, object]] = REGISTER_OVERRIDES) -> "RegisterMap":
+        root = ElementTree.parse(path).getroot()
+        registers: List[Tuple[int, str, RegAccess, int, int]] = []
+        for block in root.iterfind(".//spirit:addressBlock", SPIRIT_NS):
+            base = int(block.findtext("spirit:baseAddress", "0", SPIRIT_NS), 0)
+            block_access = block.findtext("spirit:access", "read-write", SPIRIT_NS)
+            for register in block.iterfind("spirit:register", SPIRIT_NS):
+                name = register.findtext("spirit:name", namespaces=SPIRIT_NS)
+                address = base + int(register.findtext("spirit:addressOffset", namespaces=SPIRIT_NS), 0)
+                access = IPXACT_ACCESS[register.findtext("spirit:access", block_access, SPIRIT_NS)]
+                reset = int(register.findtext("spirit:reset/spirit:value", "0", SPIRIT_NS), 0)
+
+                mask = 0
+                for reg_field in register.iterfind("spirit:field", SPIRIT_NS):
+                    offset = int(reg_field.findtext("spirit:bitOffset", namespaces=SPIRIT_NS), 0)
+                    width = int(reg_field.findtext("spirit:bitWidth", namespaces=SPIRIT_NS), 0)
+                    mask |= ((1 << width) - 1) << offset
+                if mask == 0:
+                    mask = (1 << int(register.findtext("spirit:size", namespaces=SPIRIT_NS), 0)) - 1
+
+                override = overrides.get(name, {})
+                access = override.get("access", access)
+                reset = override.get("reset", reset)
+                registers.append((address, name, access, mask, reset & mask))
+
+        reg_map = cls()
+        size = max(address for address, *_ in registers) + 1
+        reg_map.names = [None] * size
+        reg_map.access = [None] * size
+        reg_map.masks = [0] * size
+        reg_map.resets = [0] * size
+        for address, name, access, mask, reset in registers:
+            reg_map.names[address] = name
+            reg_map.access[address] = access
+            reg_map.masks[address] = mask
+            reg_map.resets[address] = reset
+        return reg_map
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def address(self, name: str) -> int:
+        return self.names.index(name)
+
+
+REGISTER_MAP: RegisterMap = RegisterMap.from_ipxact()
+
+class RegisterBankModel:
+    """Array backed register bank, every access is a single table lookup"""
+
+    def __init__(self, reg_map: RegisterMap = REGISTER_MAP):
+        self._map = reg_map
+        self._values: List[int] = list(reg_map.resets)
+
+    def reset(self) -> None:
+        self._values[:] = self._map.resets
+
+    def _access(self, address: int) -> RegAccess:
+        access = self._map.access[address] if 0 <= address < len(self._map) else None
+        if access is None:
+            raise ValueError("%s is not a valid register address" % hex(address))
+        return access
+
+    def read(self, address: int) -> int:
+        if self._access(address) is RegAccess.W:
+            return 0
+        return self._values[address]
+
+    def write(self, address: int, write_data: int) -> int:
+        """Returns the writeAck, which the RTL raises for every mapped address"""
+        if self._access(address) is not RegAccess.R:
+            self._values[address] = write_data & self._map.masks[address]
+        return 1
+
+    def __getitem__(self, address: int) -> int:
+        return self._values[address]
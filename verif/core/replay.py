@@ -0,0 +1,125 @@
+from dataclasses import asdict
+from logging import Logger, getLogger
+from typing import Dict, Optional
+
+import numpy as np
+from base_model import BaseModel
+from crc import crc8_batch
+from scoreboard import Scoreboard
+from tdc_model import _edges_to_pulses
+from trace_recorder import read_trace
+
+# Replays the checks of the MMCs over the streams recorded by TraceRecorder,
+# with the same models and Scoreboard, but without any simulator.
+
+def replay_tdc(streams: Dict[str, np.ndarray], channel: int, log: Logger, stimulus: str = "monitor") -> Optional[Scoreboard]:
+    """
+    TDCMMC: every pulse the model derives from the trigger edges, matched by o_timestamp
+
+    stimulus is "monitor" for the i_trigger edges seen by TDCInputMonitor, or "trigger"
+    for the edges BaseTriggerAgent drove, which are recorded even while the TDCMMC
+    checks precomputed outputs. The TDC ignores the edges taken while its channel is
+    disabled, so do the edges modeled here, as the monitor saw them.
+    """
+    outputs = streams.get("TDCOutputMonitor.CHAN%i" % channel)
+    if outputs is None:
+        return None
+    monitor = streams.get("TDCInputMonitor.CHAN%i" % channel)
+    if stimulus == "trigger":
+        edges = streams.get("trigger")
+        if edges is None:
+            return None
+        edges = edges[edges["channel"] == channel]
+        times = edges["time_ps"]
+        if monitor is not None:
+            # the monitor is parked while precomputed outputs are checked, those edges are kept
+            disabled = monitor["edge_ps"][monitor["enable"] == 0]
+            edges = edges[~np.isin(times, disabled)]
+            times = edges["time_ps"]
+    else:
+        edges = monitor
+        if edges is None:
+            return None
+        edges = edges[edges["enable"] == 1]
+        times = edges["edge_ps"]
+
+    scoreboard = Scoreboard(log, fields=("o_pulseWidth",), window=0, group=lambda timestamp: "CHAN%i" % channel)
+    for pulse_width, timestamp in _edges_to_pulses(np.asarray(times), np.asarray(edges["level"])).tolist():
+        scoreboard.expect(timestamp, (pulse_width,))
+    for pulse_width, timestamp in zip(outputs["o_pulseWidth"].tolist(), outputs["o_timestamp"].tolist()):
+        scoreboard.actual(timestamp, (pulse_width,))
+    scoreboard.flush()
+    return scoreboard
+
+
+def replay_reg_bank(streams: Dict[str, np.ndarray], log: Logger) -> Optional[Scoreboard]:
+    """RegBankMMC: every access modeled before the response that follows it"""
+    inputs = streams.get("RegBankInputMonitor")
+    outputs = streams.get("RegBankOutputMonitor")
+    if inputs is None or outputs is None:
+        return None
+
+    model = BaseModel()
+    scoreboard = Scoreboard(log, fields=("writeAck", "readData"), window=0)
+    # inputs up to the sim time of each output, as the checker finds them in its queue
+    modeled = np.searchsorted(inputs["time_ps"], outputs["time_ps"], side="right")
+    accesses = zip(
+        inputs["writeEnable"].tolist(), inputs["readEnable"].tolist(),
+        inputs["address"].tolist(), inputs["writeData"].tolist()
+    )
+    next_input = 0
+    for end, write_ack, read_data in zip(modeled.tolist(), outputs["writeAck"].tolist(), outputs["readData"].tolist()):
+        while next_input < end:
+            write_enable, read_enable, address, write_data = next(accesses)
+            scoreboard.expect(
+                "write" if write_enable else "read",
+                model.register_bank(read_enable=read_enable, write_enable=write_enable, address=address, write_data=write_data)
+            )
+            next_input += 1
+        scoreboard.actual("write" if write_ack else "read", (write_ack, read_data))
+    scoreboard.flush()
+    return scoreboard
+
+
+def replay_crc8(streams: Dict[str, np.ndarray], log: Logger) -> Optional[Scoreboard]:
+    """CRC8MMC: the o_match of every frame, all frames computed at once"""
+    inputs = streams.get("CRC8InputMonitor")
+    outputs = streams.get("CRC8OutputMonitor")
+    if inputs is None or outputs is None:
+        return None
+
+    data = np.asarray(inputs["i_data"], dtype=np.uint8)
+    ends = np.flatnonzero(inputs["i_last"]) + 1
+    starts = np.concatenate(([0], ends[:-1]))
+    lengths = ends - starts
+    frames = np.zeros((len(ends), max(lengths.max(initial=0), 1)), dtype=np.uint8)
+    columns = np.arange(frames.shape[1])
+    mask = columns < lengths[:, None]
+    frames[mask] = data[:ends[-1] if len(ends) else 0]
+    rows = np.arange(len(ends))
+    o_match_model = (crc8_batch(frames, lengths - 1) == frames[rows, lengths - 1]).astype(np.int64)
+
+    scoreboard = Scoreboard(log, fields=("o_match",), window=0)
+    for o_match in o_match_model.tolist():
+        scoreboard.expect("frame", (o_match,))
+    for o_match in outputs["o_match"].tolist():
+        scoreboard.actual("frame", (o_match,))
+    scoreboard.flush()
+    return scoreboard
+
+
+def replay_directory(directory: str, stimulus: str = "monitor", log: Optional[Logger] = None) -> Dict[str, dict]:
+    """Replays every checker the streams of a trace directory allow, returns their stats"""
+    if log is None:
+        log = getLogger("replay.%s" % directory)
+    streams = read_trace(directory)
+    scoreboards = {
+        "TDCMMC.CHAN0": replay_tdc(streams, 0, log, stimulus),
+        "TDCMMC.CHAN1": replay_tdc(streams, 1, log, stimulus),
+        "RegBankMMC": replay_reg_bank(streams, log),
+        "CRC8MMC": replay_crc8(streams, log),
+    }
+    return {
+        checker: {str(group): asdict(stats) for group, stats in scoreboard.stats.items()}
+        for checker, scoreboard in scoreboards.items() if scoreboard is not None
+    }
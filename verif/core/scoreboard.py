@@ -0,0 +1,138 @@
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from enum import Enum
+from itertools import count
+from logging import Logger
+from typing import Callable, Deque, Dict, Hashable, Iterator, Optional, Sequence, Tuple
+
+Payload = Tuple[int, ...]
+
+class Verdict(Enum):
+    MATCH = 0
+    MISMATCH = 1    # an item was expected under this key, with other values
+    EXTRA = 2       # nothing was expected under this key
+
+@dataclass
+class KeyStats:
+    expected: int = 0
+    matched: int = 0
+    mismatched: int = 0
+    missing: int = 0
+    extra: int = 0
+    reordered: int = 0      # matched while an older expected item was still pending
+    field_errors: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def errors(self) -> int:
+        return self.mismatched + self.missing + self.extra
+
+
+class Scoreboard:
+    """
+    Matches actual transactions against expected ones by key, in O(1) per transaction
+
+    Expected payloads are queued per key (channel, address, sequence number...),
+    an actual payload is compared to the oldest one expected under the same key,
+    so a late, lost or extra item only affects its own key.
+
+    Args
+        log: logger the errors are reported to
+        fields: names of the payload integers, for the reports
+        window: most expected items pending at once (0 is unbounded), the oldest
+            one is reported missing to make room
+        group: maps a key to the entry of stats it is counted in, the key itself by default
+    """
+
+    def __init__(
+        self, log: Logger, fields: Sequence[str], window: int = 4096,
+        group: Optional[Callable[[Hashable], Hashable]] = None
+    ):
+        self._log = log
+        self._fields: Tuple[str, ...] = tuple(fields)
+        self._window: int = window
+        self._group: Callable[[Hashable], Hashable] = group if group is not None else (lambda key: key)
+        self._seq: Iterator[int] = count()
+        self._pending: Dict[Hashable, Deque[Tuple[int, Payload]]] = {}
+        self._order: "OrderedDict[int, Hashable]" = OrderedDict()  # sequence number -> key, oldest first
+        self.stats: Dict[Hashable, KeyStats] = {}
+
+    def __len__(self) -> int:
+        """Number of expected items still pending"""
+        return len(self._order)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return bool(self._pending.get(key))
+
+    def _stats(self, key: Hashable) -> KeyStats:
+        group = self._group(key)
+        stats = self.stats.get(group)
+        if stats is None:
+            stats = self.stats[group] = KeyStats()
+        return stats
+
+    def _format(self, payload: Payload) -> str:
+        return ", ".join("%s = %#x" % (name, value) for name, value in zip(self._fields, payload))
+
+    def expect(self, key: Hashable, payload: Payload) -> None:
+        if self._window and len(self._order) >= self._window:
+            self._drop_oldest()
+        seq = next(self._seq)
+        self._pending.setdefault(key, deque()).append((seq, payload))
+        self._order[seq] = key
+        self._stats(key).expected += 1
+
+    def actual(self, key: Hashable, payload: Payload) -> Verdict:
+        stats = self._stats(key)
+        pending = self._pending.get(key)
+        if not pending:
+            stats.extra += 1
+            self._log.error("%s: unexpected %s", key, self._format(payload))
+            return Verdict.EXTRA
+
+        seq, expected = pending.popleft()
+        if not pending:
+            del self._pending[key]
+        if seq != next(iter(self._order)):
+            stats.reordered += 1
+        del self._order[seq]
+
+        if expected == payload:
+            stats.matched += 1
+            return Verdict.MATCH
+
+        stats.mismatched += 1
+        for name, expected_value, value in zip(self._fields, expected, payload):
+            if expected_value != value:
+                stats.field_errors[name] = stats.field_errors.get(name, 0) + 1
+                self._log.error("%s: expected %s = %#x, but got %#x", key, name, expected_value, value)
+        return Verdict.MISMATCH
+
+    def _drop_oldest(self) -> None:
+        seq, key = self._order.popitem(last=False)
+        pending = self._pending[key]
+        _, payload = pending.popleft()
+        if not pending:
+            del self._pending[key]
+        self._stats(key).missing += 1
+        self._log.error("%s: never got %s", key, self._format(payload))
+
+    def flush(self) -> int:
+        """Reports every pending item as missing, returns how many there were"""
+        missing = len(self._order)
+        while self._order:
+            self._drop_oldest()
+        self._pending.clear()
+        return missing
+
+    def report(self) -> None:
+        for group, stats in self.stats.items():
+            log = self._log.error if stats.errors else self._log.info
+            log(
+                "%s: %i expected, %i matched, %i mismatched, %i missing, %i extra, %i reordered",
+                group, stats.expected, stats.matched, stats.mismatched, stats.missing, stats.extra, stats.reordered
+            )
+
+    def clear(self) -> None:
+        self._pending.clear()
+        self._order.clear()
+        self.stats.clear()
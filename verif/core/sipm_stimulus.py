@@ -0,0 +1,145 @@
+from dataclasses import dataclass
+from typing import Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import cocotb
+from base_trigger_agent import PulseConfig
+
+# Times are integer ps, send the pulses with units="ps"
+PS_PER_S = 10**12
+
+@dataclass
+class SiPMConfig:
+    """
+    Statistics of the trigger pulses of one SiPM channel
+
+    width_dist is "uniform" over width_ns, "lognormal" with median width_ns[0]
+    and sigma width_ns[1], or "fixed" at width_ns[0].
+    """
+    rate_hz: float = 1e6                # Poisson arrivals of photon events
+    dark_rate_hz: float = 0.0           # Poisson arrivals of dark counts, shaped as events
+    afterpulse_prob: float = 0.0        # chance that an event or dark count is followed by an afterpulse
+    afterpulse_delay_ns: float = 100.0  # mean of the exponential delay of afterpulses
+    width_dist: str = "uniform"
+    width_ns: Tuple[float, float] = (40.0, 200.0)
+    glitch_rate_hz: float = 0.0         # Poisson arrivals of glitches, below the 20ns TDC filter
+    glitch_width_ns: Tuple[float, float] = (1.0, 19.0)
+
+
+def stimulus_rng(seed: Optional[int] = None) -> np.random.Generator:
+    """Generator seeded from cocotb.RANDOM_SEED, which runsim.py --seed sets, unless given"""
+    return np.random.default_rng(cocotb.RANDOM_SEED if seed is None else seed)
+
+
+class PulseTrain:
+    """
+    Trigger pulses as parallel int64 arrays sorted by rise time
+
+    Attributes
+        rise_ps, fall_ps: edges of each pulse, in ps
+        channel: index of the trigger vector of each pulse
+    """
+
+    units = "ps"
+
+    def __init__(self, rise_ps: np.ndarray, fall_ps: np.ndarray, channel: np.ndarray):
+        order = np.argsort(rise_ps, kind="stable")
+        self.rise_ps: np.ndarray = np.asarray(rise_ps, dtype=np.int64)[order]
+        self.fall_ps: np.ndarray = np.asarray(fall_ps, dtype=np.int64)[order]
+        self.channel: np.ndarray = np.asarray(channel, dtype=np.int64)[order]
+
+    def __len__(self) -> int:
+        return len(self.rise_ps)
+
+    def pulses(self) -> Iterator[PulseConfig]:
+        """PulseConfig of every pulse, generated lazily in start order for send_pulses"""
+        for rise, fall, channel in zip(self.rise_ps.tolist(), self.fall_ps.tolist(), self.channel.tolist()):
+            yield PulseConfig(rise_time=rise, fall_time=fall, channel=channel)
+
+    @classmethod
+    def concatenate(cls, trains: Sequence["PulseTrain"]) -> "PulseTrain":
+        return cls(
+            np.concatenate([train.rise_ps for train in trains]),
+            np.concatenate([train.fall_ps for train in trains]),
+            np.concatenate([train.channel for train in trains]),
+        )
+
+
+def _arrivals(rng: np.random.Generator, rate_hz: float, duration_ps: int) -> np.ndarray:
+    """Poisson process over [0, duration_ps): a Poisson count of uniform times"""
+    count = rng.poisson(rate_hz * duration_ps / PS_PER_S) if rate_hz > 0 else 0
+    return rng.integers(0, duration_ps, size=count, dtype=np.int64)
+
+
+def _widths(rng: np.random.Generator, dist: str, width_ns: Tuple[float, float], count: int) -> np.ndarray:
+    if dist == "uniform":
+        widths = rng.uniform(width_ns[0], width_ns[1], size=count)
+    elif dist == "lognormal":
+        widths = rng.lognormal(np.log(width_ns[0]), width_ns[1], size=count)
+    elif dist == "fixed":
+        widths = np.full(count, width_ns[0])
+    else:
+        raise ValueError("unknown width distribution %s" % dist)
+    return np.maximum(np.rint(widths * 1000), 1).astype(np.int64)
+
+
+def _discriminate(rise_ps: np.ndarray, fall_ps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ORs overlapping pulses into one, as the discriminator of a single channel does"""
+    order = np.argsort(rise_ps, kind="stable")
+    rise_ps, fall_ps = rise_ps[order], fall_ps[order]
+    if len(rise_ps) == 0:
+        return rise_ps, fall_ps
+    high_until = np.maximum.accumulate(fall_ps)
+    # a pulse opens a new one unless it rises before every earlier pulse is over
+    opens = np.concatenate(([True], rise_ps[1:] > high_until[:-1]))
+    starts = np.flatnonzero(opens)
+    ends = np.append(starts[1:], len(rise_ps)) - 1
+    return rise_ps[starts], high_until[ends]
+
+
+def sipm_pulses(
+    config: SiPMConfig, duration_ns: float, channel: int = 0,
+    rng: Optional[np.random.Generator] = None, start_ns: float = 0.0
+) -> PulseTrain:
+    """
+    Generates every trigger pulse of one channel over duration_ns, in one shot
+
+    Events, dark counts, afterpulses and glitches are drawn independently, then
+    overlapping ones are merged, so the train holds the level the trigger takes.
+    """
+    if rng is None:
+        rng = stimulus_rng()
+    duration_ps = int(duration_ns * 1000)
+
+    primaries = np.concatenate((
+        _arrivals(rng, config.rate_hz, duration_ps),
+        _arrivals(rng, config.dark_rate_hz, duration_ps),
+    ))
+    followed = primaries[rng.random(len(primaries)) < config.afterpulse_prob]
+    afterpulses = followed + np.rint(rng.exponential(config.afterpulse_delay_ns * 1000, size=len(followed))).astype(np.int64)
+    afterpulses = afterpulses[afterpulses < duration_ps]
+
+    rise_ps = np.concatenate((primaries, afterpulses))
+    fall_ps = rise_ps + _widths(rng, config.width_dist, config.width_ns, len(rise_ps))
+
+    glitches = _arrivals(rng, config.glitch_rate_hz, duration_ps)
+    glitch_widths = _widths(rng, "uniform", config.glitch_width_ns, len(glitches))
+
+    rise_ps, fall_ps = _discriminate(
+        np.concatenate((rise_ps, glitches)),
+        np.concatenate((fall_ps, glitches + glitch_widths))
+    )
+    start_ps = int(start_ns * 1000)
+    return PulseTrain(rise_ps + start_ps, fall_ps + start_ps, np.full(len(rise_ps), channel, dtype=np.int64))
+
+
+def sipm_array_pulses(
+    configs: Sequence[SiPMConfig], duration_ns: float,
+    rng: Optional[np.random.Generator] = None, start_ns: float = 0.0
+) -> PulseTrain:
+    """sipm_pulses of channels 0, 1... with one config each, merged in one train"""
+    if rng is None:
+        rng = stimulus_rng()
+    return PulseTrain.concatenate([
+        sipm_pulses(config, duration_ns, channel, rng, start_ns) for channel, config in enumerate(configs)
+    ])
@@ -0,0 +1,156 @@
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from cocotb.log import SimLog
+
+GLITCH_PS = 20 * 10**3          # pulses shorter than 20ns are rejected
+DEBOUNCE_PS = 19 * 10**3        # a rise closer than this to the last fall extends the pulse
+WIDTH_CAP_PS = 5 * 10**6        # pulse width saturates at 50us
+LSB_PS = 40                     # TDC resolution
+WRAP_PS = LSB_PS * 2**32        # timestamps wrap @ 171ms
+OPEN_PS = np.iinfo(np.int64).max // 2  # fall time of a segment still high at the end
+
+UNITS_PS = {"ps": 1, "ns": 10**3, "us": 10**6, "ms": 10**9, "sec": 10**12}
+
+class TDCState(Enum):
+    IDLE = 0
+    HIGH = 1
+    DEBOUNCE = 2
+
+class TDCModel:
+    """
+    Reference model of one TDC channel, as a state machine over timestamped edges
+
+    Time is an integer number of ps. Each call consumes one edge, or just the
+    passing of time, and returns the (o_pulseWidth, o_timestamp) of a pulse
+    once it is known to be complete, None otherwise.
+    """
+
+    def __init__(self):
+        self._log = SimLog("cocotb.%s" % type(self).__qualname__)
+        self.reset()
+
+    def reset(self) -> None:
+        self.state: TDCState = TDCState.IDLE
+        self._rise: int = 0
+        self._fall: int = 0
+
+    @property
+    def deadline(self) -> Optional[int]:
+        """Time at which the pending pulse completes if no rising edge comes first"""
+        if self.state is TDCState.DEBOUNCE:
+            return self._fall + DEBOUNCE_PS
+        return None
+
+    def advance(self, time_ps: int) -> Optional[Tuple[int, int]]:
+        if self.state is TDCState.DEBOUNCE and time_ps >= self._fall + DEBOUNCE_PS:
+            self.state = TDCState.IDLE
+            return self._quantize(self._rise, self._fall)
+        return None
+
+    def edge(self, time_ps: int, level: int) -> Optional[Tuple[int, int]]:
+        pulse = self.advance(time_ps)
+        if level:
+            if self.state is TDCState.IDLE:
+                self._rise = time_ps
+                self.state = TDCState.HIGH
+            elif self.state is TDCState.DEBOUNCE:
+                self._log.info("20ns or less glitch detected")
+                self.state = TDCState.HIGH
+        elif self.state is TDCState.HIGH:
+            if time_ps - self._rise < GLITCH_PS:
+                self._log.info("20ns or less glitch detected")
+                self.state = TDCState.IDLE
+            else:
+                self._fall = time_ps
+                self.state = TDCState.DEBOUNCE
+        return pulse
+
+    def run(self, edges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Offline mode, consumes time sorted (time_ps, level) edges and flushes the last pulse"""
+        pulses: List[Tuple[int, int]] = []
+        for time_ps, level in edges:
+            pulse = self.edge(time_ps, level)
+            if pulse is not None:
+                pulses.append(pulse)
+        if self.state is TDCState.DEBOUNCE:
+            pulses.append(self.advance(self.deadline))
+        return pulses
+
+    @staticmethod
+    def _quantize(rise_ps: int, fall_ps: int) -> Tuple[int, int]:
+        pulse_width = min(fall_ps - rise_ps, WIDTH_CAP_PS)
+        timestamp = rise_ps % WRAP_PS
+        return (pulse_width // LSB_PS, timestamp // LSB_PS)
+
+
+def _edges_to_pulses(times: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    """Vectorized TDCModel.run(), returns an (n, 2) array of (o_pulseWidth, o_timestamp)"""
+    if len(times) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    # Several writes at the same instant: the last one, a rise, wins
+    order = np.lexsort((levels, times))
+    times, levels = times[order], levels[order]
+    last = np.append(times[1:] != times[:-1], True)
+    times, levels = times[last], levels[last]
+    # Keep actual transitions of the trigger level, starting from low
+    changed = levels != np.concatenate(([0], levels[:-1]))
+    times = times[changed]
+    rises, falls = times[0::2], times[1::2]
+    if len(rises) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    if len(rises) > len(falls):
+        # still high at the end, this segment may extend the pulse before it
+        falls = np.append(falls, OPEN_PS)
+
+    narrow = (falls - rises) < GLITCH_PS
+    short_gap = np.concatenate(([False], (rises[1:] - falls[:-1]) < DEBOUNCE_PS))
+
+    # A segment is dropped if it and every segment chained to it by short gaps are glitches
+    wide_count = np.cumsum(~narrow)
+    chain_start = np.flatnonzero(~short_gap)
+    chain_id = np.cumsum(~short_gap) - 1
+    wide_before_chain = wide_count[chain_start] - (~narrow[chain_start])
+    dropped = (wide_count - wide_before_chain[chain_id]) == 0
+    # A kept segment opens a pulse unless it extends the previous, kept, segment
+    opens = ~dropped & (~short_gap | np.concatenate(([True], dropped[:-1])))
+
+    kept = np.flatnonzero(~dropped)
+    if len(kept) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    pulse_id = np.cumsum(opens)[kept]
+    closes = kept[np.append(pulse_id[1:] != pulse_id[:-1], True)]
+
+    pulse_rises, pulse_falls = rises[opens], falls[closes]
+    # a pulse closed by the open segment never completes
+    complete = pulse_falls != OPEN_PS
+    pulse_rises, pulse_falls = pulse_rises[complete], pulse_falls[complete]
+    pulses = np.empty((len(pulse_rises), 2), dtype=np.int64)
+    pulses[:, 0] = np.minimum(pulse_falls - pulse_rises, WIDTH_CAP_PS) // LSB_PS
+    pulses[:, 1] = (pulse_rises % WRAP_PS) // LSB_PS
+    return pulses
+
+
+def expected_tdc_outputs(pulses: Iterable[Any], units: str = "ns", start_ps: int = 0) -> Dict[Any, np.ndarray]:
+    """
+    Computes every TDC output expected from a list of PulseConfig, without simulation
+
+    Args
+        pulses: PulseConfig as given to BaseTriggerAgent.send_pulses
+        units: time units of the pulses
+        start_ps: sim time at which send_pulses starts
+
+    Return value maps each channel to an (n, 2) int64 array of (o_pulseWidth, o_timestamp)
+    """
+    scale = UNITS_PS[units]
+    per_channel: Dict[Any, List[Tuple[int, int]]] = {}
+    for pulse in pulses:
+        per_channel.setdefault(pulse.channel, []).append((pulse.rise_time, pulse.fall_time))
+
+    expected: Dict[Any, np.ndarray] = {}
+    for channel, rise_fall in per_channel.items():
+        rise_fall_ps = np.asarray(rise_fall, dtype=np.int64) * scale + start_ps
+        times = np.concatenate((rise_fall_ps[:, 0], rise_fall_ps[:, 1]))
+        levels = np.concatenate((np.ones(len(rise_fall_ps), dtype=np.int8), np.zeros(len(rise_fall_ps), dtype=np.int8)))
+        expected[channel] = _edges_to_pulses(times, levels)
+    return expected
@@ -12,7 +12,9 @@ from cocotb.queue import Queue
 from cocotb.triggers import RisingEdge
 from cocotb.log import SimLog
 
-class DataValidMonitor_Template:
+from base_monitor import BaseMonitor
+
+class DataValidMonitor_Template(BaseMonitor):
     """
     Reusable Monitor of one-way control flow (data/valid) streaming data interface
 
@@ -25,37 +27,15 @@ class DataValidMonitor_Template:
     def __init__(
         self, clk: SimHandleBase, valid: SimHandleBase, datas: Dict[str, SimHandleBase]
     ):
-        self.values = Queue[Dict[str, int]]()
-        self._clk = clk
+        super(DataValidMonitor_Template, self).__init__(clk, datas, logger_name="Monitor.%s" % (type(self).__qualname__))
         self._valid = valid
-        self._datas = datas
-        self._coro = None # is monitor running? False if "None"
-
-        self.log = SimLog("cocotb.Monitor.%s" % (type(self).__qualname__))
-
-    def start(self) -> None:
-        """Start monitor"""
-        if self._coro is not None:
-            raise RuntimeError("Monitor already started")
-        self._coro = cocotb.start_soon(self._run())
-
-    def stop(self) -> None:
-        """Stop monitor"""
-        if self._coro is None:
-            raise RuntimeError("Monitor never started")
-        self._coro.kill()
-        self._coro = None
 
+        self.log = self._log
 
     async def _run(self) -> None:
-        while True:
-            await RisingEdge(self._clk)
-            # this condition decides when to record the signal states
-            if self._valid.value.binstr != "1":
-                # skip whatever comes after, and start the while loop again
-                continue
-            # store the samples, as formatted by the _sample method
-            self.values.put_nowait(self._sample())
+        # records the signal states on every clock cycle where valid is high,
+        # only waking up on the clock while valid is asserted
+        await self._run_data_valid(self._valid)
 
     def _sample(self) -> Dict[str, Any]:
         """
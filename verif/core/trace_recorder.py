@@ -0,0 +1,109 @@
+import json
+from os import makedirs
+from os.path import join
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from cocotb.log import SimLog
+from cocotb.utils import get_sim_time
+
+TRACE_INDEX = "index.json"
+
+def trace_dtype(fields: Sequence[str]) -> np.dtype:
+    """Fixed width record layout: sim time in ps, source id, then one int64 per field"""
+    return np.dtype([("time_ps", "<i8"), ("source", "<u4")] + [(name, "<i8") for name in fields])
+
+
+class TraceStream:
+    """Append-only binary file of records, written in blocks of block_size records"""
+
+    def __init__(self, path: str, source: int, fields: Sequence[str], block_size: int):
+        self.path = path
+        self.source = source
+        self.fields: Tuple[str, ...] = tuple(fields)
+        self.records: int = 0   # records written to the file so far
+        self._block: np.ndarray = np.zeros(block_size, dtype=trace_dtype(fields))
+        self._count: int = 0
+        self._file = open(path, "wb")
+
+    def record(self, values: Sequence[int], time_ps: Optional[int] = None) -> None:
+        """Appends one record, stamped with the current sim time unless given"""
+        if time_ps is None:
+            time_ps = round(get_sim_time(units="ps"))
+        self._block[self._count] = (time_ps, self.source, *values)
+        self._count += 1
+        if self._count == len(self._block):
+            self.flush()
+
+    def flush(self) -> None:
+        self._block[:self._count].tofile(self._file)
+        self._file.flush()
+        self.records += self._count
+        self._count = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+
+class TraceRecorder:
+    """
+    Records transactions of monitors and agents, one TraceStream per source
+
+    Each stream goes to <directory>/<name>.bin, described in <directory>/index.json
+    so it can be read back with read_trace, without loading whole files.
+
+    Args
+        directory: where the trace files go, created if needed
+        block_size: records buffered per stream before they are written
+    """
+
+    def __init__(self, directory: str, block_size: int = 2**16):
+        self.directory = directory
+        self._block_size = block_size
+        self._streams: Dict[str, TraceStream] = {}
+        self._log = SimLog("cocotb.%s" % type(self).__qualname__)
+        makedirs(directory, exist_ok=True)
+
+    def stream(self, name: str, fields: Sequence[str]) -> TraceStream:
+        if name in self._streams:
+            raise ValueError("trace stream %s is already registered" % name)
+        stream = TraceStream(join(self.directory, name + ".bin"), len(self._streams), fields, self._block_size)
+        self._streams[name] = stream
+        # written right away, so a crashed run still leaves readable traces
+        self._write_index()
+        return stream
+
+    def _write_index(self) -> None:
+        index = {
+            name: dict(file=name + ".bin", source=stream.source, fields=list(stream.fields), records=stream.records)
+            for name, stream in self._streams.items()
+        }
+        with open(join(self.directory, TRACE_INDEX), "w") as index_file:
+            json.dump(index, index_file, indent=2)
+
+    def close(self) -> None:
+        for stream in self._streams.values():
+            stream.close()
+        self._write_index()
+        self._log.info(
+            "%i records traced to %s",
+            sum(stream.records for stream in self._streams.values()),
+            self.directory
+        )
+
+
+def read_trace(directory: str) -> Dict[str, np.ndarray]:
+    """Maps every stream of a trace directory as a read-only structured array"""
+    with open(join(directory, TRACE_INDEX)) as index_file:
+        index = json.load(index_file)
+    streams: Dict[str, np.ndarray] = {}
+    for name, entry in index.items():
+        dtype = trace_dtype(entry["fields"])
+        path = join(directory, entry["file"])
+        try:
+            streams[name] = np.memmap(path, dtype=dtype, mode="r")
+        except ValueError:
+            # np.memmap refuses empty files
+            streams[name] = np.zeros(0, dtype=dtype)
+    return streams
@@ -1,6 +1,5 @@
-from dataclasses import dataclass, field
-from typing import Tuple
-from cocotb.binary import BinaryValue
+from dataclasses import dataclass, field, fields
+from typing import Dict, Tuple, Union
 from cocotb.log import SimLog
 from enum import Enum
 from logging import Logger
@@ -39,65 +38,74 @@ class UartConfig:
     frame_size: int = 8
     packet_size: int = 48
     big_endian: bool = False
-    tx_pkt_struct: UartTxPktStruct = UartTxPktStruct()
-    rx_pkt_struct: UartRxPktStruct = UartRxPktStruct()
+    tx_pkt_struct: UartTxPktStruct = field(default_factory=UartTxPktStruct)
+    rx_pkt_struct: UartRxPktStruct = field(default_factory=UartRxPktStruct)
+
+_layouts: Dict[int, Tuple[object, Tuple[Tuple[int, int], ...]]] = {}
+
+def pkt_layout(pkt_struct: Union[UartTxPktStruct, UartRxPktStruct]) -> Tuple[Tuple[int, int], ...]:
+    """(shift, mask) of every field of a packet struct, in declaration order, computed once per struct"""
+    cached = _layouts.get(id(pkt_struct))
+    if cached is None or cached[0] is not pkt_struct:
+        layout = tuple(
+            (start, (1 << (end - start)) - 1)
+            for start, end in (getattr(pkt_struct, pos.name) for pos in fields(pkt_struct))
+        )
+        cached = _layouts[id(pkt_struct)] = (pkt_struct, layout)
+    return cached[1]
+
+def byteorder(uart_config: UartConfig) -> str:
+    return "big" if uart_config.big_endian else "little"
+
+class UartTxPckt:
+    __slots__ = ("cmd", "addr", "data", "message", "buff")
+    _log: Logger = SimLog("cocotb.UartTxPckt")
 
-class UartTxPckt(BinaryValue):
     def __init__(self, cmd: UartTxCmd, addr: RegAddr, data: int, uart_config: UartConfig):
         self.cmd: UartTxCmd = cmd
         self.addr: RegAddr = addr
         self.data: int = data
-        self.uart_config: UartConfig = uart_config
+        (cmd_shift, cmd_mask), _, (addr_shift, addr_mask), (data_shift, data_mask) = pkt_layout(uart_config.tx_pkt_struct)
         self.message: int = (
-            (cmd.value << self.uart_config.tx_pkt_struct.cmd_pos[0])
-            + (addr.value << self.uart_config.tx_pkt_struct.addr_pos[0])
-            + (data << self.uart_config.tx_pkt_struct.data_pos[0])
+            ((cmd.value & cmd_mask) << cmd_shift)
+            | ((addr.value & addr_mask) << addr_shift)
+            | ((data & data_mask) << data_shift)
         )
-        super(UartTxPckt, self).__init__(
-            value=self.message,
-            n_bits=self.uart_config.packet_size,
-            bigEndian=self.uart_config.big_endian,
-        )
-        self._log: Logger = SimLog("cocotb.%s" % (type(self).__qualname__))
+        self.buff: bytes = self.message.to_bytes(uart_config.packet_size // 8, byteorder(uart_config))
+
+    def __repr__(self) -> str:
+        return "UartTxPckt(cmd=%s, addr=%s, data=%#x)" % (self.cmd.name, self.addr.name, self.data)
 
     def log_pkt(self) -> None:
-        self._log.info("\tCMD: %s", self.cmd)
-        self._log.info("\tRES: %s", "0x0")
-        self._log.info("\tADDR: %s", self.addr)
-        self._log.info("\tDATA: %s", hex(self.data))
+        self._log.info("%s", self)
 
 
+class UartRxPckt:
+    __slots__ = ("type", "res1", "num", "chan", "res0", "data")
+    _log: Logger = SimLog("cocotb.UartRxPckt")
 
-class UartRxPckt(BinaryValue):
     def __init__(self, rx_pkt_bytes: bytes, uart_config: UartConfig):
-        self.uart_config: UartConfig = uart_config
-        super().__init__(
-            value=rx_pkt_bytes,
-            n_bits=self.uart_config.packet_size,
-            bigEndian=self.uart_config.big_endian
+        pkt = int.from_bytes(rx_pkt_bytes, byteorder(uart_config))
+        (
+            (type_shift, type_mask),
+            (res1_shift, res1_mask),
+            (num_shift, num_mask),
+            (chan_shift, chan_mask),
+            (res0_shift, res0_mask),
+            (data_shift, data_mask),
+        ) = pkt_layout(uart_config.rx_pkt_struct)
+
+        self.type: UartRxType = UartRxType((pkt >> type_shift) & type_mask)
+        self.res1: int = (pkt >> res1_shift) & res1_mask
+        self.num: int = (pkt >> num_shift) & num_mask
+        self.chan: int = (pkt >> chan_shift) & chan_mask
+        self.res0: int = (pkt >> res0_shift) & res0_mask
+        self.data: int = (pkt >> data_shift) & data_mask
+
+    def __repr__(self) -> str:
+        return "UartRxPckt(type=%s, res1=%#x, num=%#x, chan=%#x, res0=%#x, data=%#x)" % (
+            self.type.name, self.res1, self.num, self.chan, self.res0, self.data
         )
-        pkt_str = self.binstr[::-1]
-        
-
-        type_start, type_end = self.uart_config.rx_pkt_struct.type_pos
-        res1_start, res1_end = self.uart_config.rx_pkt_struct.res1_pos
-        num_start, num_end = self.uart_config.rx_pkt_struct.num_pos
-        chan_start, chan_end = self.uart_config.rx_pkt_struct.chan_pos
-        res0_start, res0_end = self.uart_config.rx_pkt_struct.res0_pos
-        data_start, data_end = self.uart_config.rx_pkt_struct.data_pos
-
-        self.type: UartRxType = UartRxType(int(pkt_str[type_start:type_end][::-1], 2))
-        self.res1: str = hex(int(pkt_str[res1_start:res1_end][::-1], 2))
-        self.num: str = hex(int(pkt_str[num_start:num_end][::-1], 2))
-        self.chan: str = hex(int(pkt_str[chan_start:chan_end][::-1], 2))
-        self.res0: str = hex(int(pkt_str[res0_start:res0_end][::-1], 2))
-        self.data: str = hex(int(pkt_str[data_start:data_end][::-1], 2))
-        self._log: Logger = SimLog("cocotb.%s" % (type(self).__qualname__))
 
     def log_pkt(self):
-        self._log.info("\tTYPE: %s", self.type)
-        self._log.info("\tRES1: %s", self.res1)
-        self._log.info("\tNUM: %s", self.num)
-        self._log.info("\tCHAN: %s", self.chan)
-        self._log.info("\tRES0: %s", self.res0)
-        self._log.info("\tDATA: %s", self.data)
+        self._log.info("%s", self)
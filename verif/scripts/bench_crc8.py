@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+## Compares the table driven CRC-8 of verif/core/crc.py against the former
+## bit by bit bitarray implementation, on UART sized frames.
+##
+## usage: bench_crc8.py [--frames N]
+
+import argparse
+import os
+import sys
+from random import randbytes, seed
+from timeit import timeit
+
+from bitarray.util import int2ba, ba2int
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+from crc import CRC8_START, CRC_POLY, crc8
+
+
+def bitarray_crc8(bytes_array: bytes) -> int:
+    current_crc = CRC8_START
+    for byte in bytes_array:
+        crc = int2ba(current_crc, 8)
+        data_bits = int2ba(byte, 8)
+        poly = int2ba(CRC_POLY, 8)
+        for j in range(7, -1, -1):
+            if crc[7] != data_bits[j]:
+                crc = (crc >> 1) ^ poly
+            else:
+                crc >>= 1
+        current_crc = ba2int(crc)
+    return current_crc
+
+
+parser = argparse.ArgumentParser(description='CRC-8 implementation benchmark.')
+parser.add_argument('-n', '--frames', type=int, default=20000, help='Integer. Number of frames per run.')
+parser.add_argument('-s', '--size', type=int, default=6, help='Integer. Bytes per frame, 6 is a UART packet.')
+args = parser.parse_args()
+
+seed(0)
+frames = [randbytes(args.size) for _ in range(args.frames)]
+
+for frame in frames[:1000]:
+    assert crc8(frame) == bitarray_crc8(frame), "table and bitarray CRC-8 disagree"
+
+t_bitarray = timeit(lambda: [bitarray_crc8(frame) for frame in frames], number=1)
+t_table = timeit(lambda: [crc8(frame) for frame in frames], number=1)
+
+print("%i frames of %i bytes" % (args.frames, args.size))
+print("bitarray : %8.3f ms, %8.3f us/frame" % (t_bitarray * 1e3, t_bitarray * 1e6 / args.frames))
+print("table    : %8.3f ms, %8.3f us/frame" % (t_table * 1e3, t_table * 1e6 / args.frames))
+print("speedup  : %8.1fx" % (t_bitarray / t_table))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+## Compares the time sorted edge timeline of BaseTriggerAgent.send_pulses against
+## the former min()/list.remove() scheduler, without simulator: Timer awaits are
+## counted instead of simulated, so only the scheduling cost is measured. Also
+## shows the trigger writes of the per bit and coalesced (vector) modes.
+##
+## usage: bench_send_pulses.py [--pulses N [N ...]] [--channels C] [--legacy-max N]
+
+import argparse
+import os
+import sys
+from itertools import groupby
+from operator import itemgetter
+from random import randint, seed
+from timeit import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+from base_trigger_agent import PulseConfig, pulse_timeline, vector_timeline
+
+
+def legacy_schedule(pulses):
+    """The former _send_pulses loop, returns its (timers, edges driven)"""
+    rise_time_list = [pulse.rise_time for pulse in pulses]
+    fall_time_list = [pulse.fall_time for pulse in pulses]
+    timers = edges = 0
+    while len(fall_time_list) > 0:
+        min_fall = min(fall_time_list)
+        if len(rise_time_list) > 0:
+            min_rise = min(rise_time_list)
+        else:
+            min_rise = min(fall_time_list)+1
+        timers += 1
+        if min_rise < min_fall:
+            edges += sum(pulse.rise_time == min_rise for pulse in pulses)
+            rise_time_list.remove(min_rise)
+        if min_fall < min_rise:
+            edges += sum(pulse.fall_time == min_fall for pulse in pulses)
+            fall_time_list.remove(min_fall)
+        if min_fall == min_rise:
+            edges += sum(pulse.fall_time == min_fall for pulse in pulses)
+            edges += sum(pulse.rise_time == min_rise for pulse in pulses)
+            fall_time_list.remove(min_fall)
+            rise_time_list.remove(min_rise)
+    return timers, edges
+
+
+def timeline_schedule(pulses):
+    """BaseTriggerAgent._send_timeline, returns its (timers, edges driven)"""
+    timers = edges = 0
+    gen_time = 0
+    for time, same_time_edges in groupby(pulse_timeline(pulses), key=itemgetter(0)):
+        if time > gen_time:
+            timers += 1
+            gen_time = time
+        for _ in same_time_edges:
+            edges += 1
+    return timers, edges
+
+
+parser = argparse.ArgumentParser(description='send_pulses scheduler benchmark.')
+parser.add_argument('-n', '--pulses', type=int, nargs='+', default=[10**2, 10**4, 10**6], help='Integers. Pulse counts to run.')
+parser.add_argument('-c', '--channels', type=int, default=2, help='Integer. Trigger channels the pulses are spread over.')
+parser.add_argument('--legacy-max', type=int, default=10**4, help='Integer. Largest pulse count the O(n^2) scheduler is run on.')
+args = parser.parse_args()
+
+seed(0)
+print("%10s %14s %14s %10s %10s %12s %12s" % ("pulses", "legacy (ms)", "timeline (ms)", "speedup", "timers", "bit writes", "vec writes"))
+for count in args.pulses:
+    # 100ns apart per channel on average, 20 to 60ns wide, edges on a 10ns grid so some coincide
+    pulses = []
+    for channel in range(args.channels):
+        time = 0
+        for _ in range(count // args.channels):
+            time += 10 * randint(5, 15) * args.channels
+            pulses.append(PulseConfig(rise_time=time, fall_time=time + 10 * randint(2, 6), channel=channel))
+
+    result = {}
+    vector_writes = sum(1 for _ in vector_timeline(pulse_timeline(pulses)))
+    t_timeline = timeit(lambda: result.update(timeline=timeline_schedule(pulses)), number=1)
+    if count <= args.legacy_max:
+        t_legacy = timeit(lambda: result.update(legacy=legacy_schedule(pulses)), number=1)
+        print("%10i %14.3f %14.3f %9.1fx %10i %12i %12i" % (
+            count, t_legacy * 1e3, t_timeline * 1e3, t_legacy / t_timeline, *result["timeline"], vector_writes
+        ))
+    else:
+        print("%10i %14s %14.3f %10s %10i %12i %12i" % (count, "-", t_timeline * 1e3, "-", *result["timeline"], vector_writes))
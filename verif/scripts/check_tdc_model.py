@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+## Cross-checks the vectorized TDC model of verif/core/tdc_model.py, used to
+## precompute expected outputs, against the TDCModel state machine, on fixed
+## corner cases then on random edge trains.
+##
+## usage: check_tdc_model.py [--trains N] [--edges N]
+
+import argparse
+import os
+import sys
+from random import randint, seed
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+from tdc_model import DEBOUNCE_PS, GLITCH_PS, TDCModel, _edges_to_pulses
+
+
+def vectorized(edges):
+    times = np.array([time for time, _ in edges], dtype=np.int64)
+    levels = np.array([level for _, level in edges], dtype=np.int8)
+    return [tuple(pulse) for pulse in _edges_to_pulses(times, levels).tolist()]
+
+
+def state_machine(edges):
+    return [tuple(pulse) for pulse in TDCModel().run(edges)]
+
+
+CASES = {
+    "single pulse": [(0, 1), (50000, 0)],
+    "glitch": [(0, 1), (GLITCH_PS - 1, 0)],
+    "debounce merge": [(0, 1), (50000, 0), (50000 + DEBOUNCE_PS - 1, 1), (100000, 0)],
+    "ends high": [(0, 1), (50000, 0), (100000, 1)],
+    "ends high inside debounce": [(0, 1), (50000, 0), (50000 + DEBOUNCE_PS - 1, 1)],
+    "ends high after a glitch": [(0, 1), (GLITCH_PS - 1, 0), (GLITCH_PS, 1)],
+}
+
+parser = argparse.ArgumentParser(description='TDC model cross-check.')
+parser.add_argument('-n', '--trains', type=int, default=2000, help='Integer. Number of random edge trains.')
+parser.add_argument('-e', '--edges', type=int, default=40, help='Integer. Most edges per random train.')
+args = parser.parse_args()
+
+for name, edges in CASES.items():
+    assert vectorized(edges) == state_machine(edges), "%s: %s != %s" % (name, vectorized(edges), state_machine(edges))
+    print("%-28s %s" % (name, state_machine(edges)))
+
+seed(0)
+for _ in range(args.trains):
+    # alternating levels, gaps around the glitch and debounce thresholds
+    edges, time = [], 0
+    for index in range(randint(1, args.edges)):
+        time += randint(1, 3 * GLITCH_PS)
+        edges.append((time, 1 - index % 2))
+    assert vectorized(edges) == state_machine(edges), "%s: %s != %s" % (edges, vectorized(edges), state_machine(edges))
+print("%i random trains agree" % args.trains)
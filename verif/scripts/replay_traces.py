@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+## Replays the MMC checks over traces recorded with runsim.py --trace, without
+## simulating, so a model fix or a new check can be run on a whole regression.
+## Every directory holding an index.json under the given paths is one job.
+##
+## usage: replay_traces.py [-j JOBS] [--stimulus monitor|trigger] [-v] PATH [PATH ...]
+
+import argparse
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+from replay import replay_directory
+from trace_recorder import TRACE_INDEX
+
+
+def find_traces(paths):
+    for path in paths:
+        for root, _, files in os.walk(path):
+            if TRACE_INDEX in files:
+                yield root
+
+
+def replay(directory, stimulus, verbose):
+    logging.basicConfig(level=logging.ERROR if verbose else logging.CRITICAL, format="%(name)s: %(message)s")
+    return directory, replay_directory(directory, stimulus=stimulus)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline replay of recorded transaction traces through the MMC checks.')
+    parser.add_argument('paths', nargs='+', help='String. Trace directories, searched recursively.')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='Integer. Number of worker processes.')
+    parser.add_argument('--stimulus', choices=("monitor", "trigger"), default="monitor", help='String. TDC edges to model, as seen by TDCInputMonitor or as driven by BaseTriggerAgent.')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Bool Switch. Log every mismatch, not only the totals.')
+    args = parser.parse_args()
+
+    directories = sorted(find_traces(args.paths))
+    if not directories:
+        print("no %s found under %s" % (TRACE_INDEX, " ".join(args.paths)))
+        return 1
+
+    start = perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        jobs = [pool.submit(replay, directory, args.stimulus, args.verbose) for directory in directories]
+        for job in jobs:
+            directory, checkers = job.result()
+            for checker, groups in checkers.items():
+                for group, stats in groups.items():
+                    errors = stats["mismatched"] + stats["missing"] + stats["extra"]
+                    failed += errors > 0
+                    print("%-6s %s %s %s: %i expected, %i matched, %i mismatched, %i missing, %i extra, %i reordered" % (
+                        "FAIL" if errors else "PASS", directory, checker, group,
+                        stats["expected"], stats["matched"], stats["mismatched"],
+                        stats["missing"], stats["extra"], stats["reordered"]
+                    ))
+
+    print("replayed %i trace directories in %.2f s, %i checks failed" % (len(directories), perf_counter() - start, failed))
+    return 1 if failed else 0
+
+
+# the worker processes import this module, spawn start method included
+if __name__ == "__main__":
+    sys.exit(main())
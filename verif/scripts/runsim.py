@@ -83,6 +83,9 @@ parser.add_argument('--sva', help="Bool Switch. Include SystemVerilog Assertions
 parser.add_argument('-c', '--cov', help="Bool Switch. Enable functional coverage collection.", action="store_true")
 parser.add_argument('--cocotb-sanity-check', dest='cocotbsanity', help="Bool Switch. Run cocotb sanity check.", action="store_true")
 parser.add_argument('-p', '--pycharm-debug', dest='pydebug', help="Bool Switch. Enable Python interactive debug or not.", action="store_true")
+parser.add_argument('--verbosity', choices=("quiet", "normal", "full"), default="normal", help='String. UART packet records: none, the first ones of each kind then a sample, or all of them.')
+parser.add_argument('--profile', type=str, nargs='?', const="coroutine_profile.json", help='String. Profile the testbench coroutines, report written to this JSON file, defaults to "coroutine_profile.json" in the simulation directory.')
+parser.add_argument('--trace', type=str, nargs='?', const="traces", help='String. Record binary transaction traces to this directory, defaults to "traces" in the simulation directory.')
 
 
 # parser.add_argument('integers', metavar='N', type=int, nargs='+',
@@ -107,6 +110,8 @@ VMANAGER_REGRESSIONS_AREA = os.environ.get('VMANAGER_REGRESSIONS_AREA')
 if(args.pydebug == True):
     os.environ["PYCHARMDEBUG"] = "enabled"
 
+os.environ["VERIF_VERBOSITY"] = args.verbosity
+
 
 if not isfile(PROJECT_ROOT + "/.hosts_local"):
     print("Licence redirection file for vmanager missing. Please recover from the git repository.")
@@ -141,6 +146,21 @@ if(PWD != (PROJECT_ROOT + "/simdir")) and (VMANAGER_REGRESSIONS_AREA not in PWD)
 
 
 
+# relative to the simulation directory
+if(args.trace != None):
+    os.environ["TRACE_DIR"] = os.path.abspath(args.trace)
+if(args.profile != None):
+    os.environ["VERIF_PROFILE"] = os.path.abspath(args.profile)
+
+# sim speed of every test run, one JSON object per line, for vManager
+os.environ["VERIF_METRICS"] = os.path.abspath(args.test + "_metrics.jsonl")
+if isfile(os.environ["VERIF_METRICS"]):
+    os.remove(os.environ["VERIF_METRICS"])
+# rate vs loss curves of the TDC saturation sweeps, SW.*
+os.environ["VERIF_SWEEP"] = os.path.abspath(args.test + "_saturation.jsonl")
+if isfile(os.environ["VERIF_SWEEP"]):
+    os.remove(os.environ["VERIF_SWEEP"])
+
 # Set default manifest files
 DesignFiles="-f " + DESIGN_ROOT + "/digital/digital_design_manifest.f"
 Models= "-f " + MODELS_HLM_ROOT + "/mixed_sig_modules_manifest.f"
@@ -206,6 +226,9 @@ if(args.seed == None):
     MainOptions += " -seed random"
 else:
     MainOptions += (" -seed " + args.seed)
+    if(args.seed != "random"):
+        # cocotb seeds random, and the sipm_stimulus generators, from it
+        os.environ["RANDOM_SEED"] = args.seed
 
 
 # Method 2 Use cocotb_test with force to true
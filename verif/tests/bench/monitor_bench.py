@@ -0,0 +1,22 @@
+from typing import Type
+from base_environment import BaseEnvironment
+
+
+def monitor_wakeups(env: BaseEnvironment) -> int:
+    """Wake-ups of every monitor of env, as counted by each BaseMonitor._run"""
+    wakeups = 0
+    for mmc in env._mmc_list:
+        wakeups += mmc._input_mon.wakeups + mmc._output_mon.wakeups
+    return wakeups
+
+
+def with_gated_monitors(env_class: Type[BaseEnvironment], gated: bool) -> Type[BaseEnvironment]:
+    """Subclass of env_class whose monitors are built with the given gated"""
+    class BenchEnvironment(env_class):
+        def _build_env(self) -> None:
+            super(BenchEnvironment, self)._build_env()
+            for mmc in self._mmc_list:
+                for monitor in mmc.monitors:
+                    monitor.gated = gated
+    BenchEnvironment.__qualname__ = env_class.__qualname__
+    return BenchEnvironment
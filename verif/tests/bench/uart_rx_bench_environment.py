@@ -0,0 +1,77 @@
+from time import perf_counter
+from typing import List, Type
+from cocotb.handle import HierarchyObject
+from cocotb.triggers import ClockCycles, Timer
+from cocotb.utils import get_sim_time
+from base_environment import BaseEnvironment, DutConfig
+from base_uart_agent import BaseUartAgent, UartConfig, UartTxCmd, UartRxPckt, UartRxType
+from base_model import RegAddr
+
+
+class PollingUartAgent(BaseUartAgent):
+    """UART agent with the former listener, polling the sink on every DUT clock"""
+
+    async def _listen_uart_rx(self) -> None:
+        nb_bytes_expected = int(self.uart_config.packet_size / self._uart_config.frame_size)
+        while(True):
+            while self._uart_sink.count() < nb_bytes_expected:
+                await ClockCycles(self._dut_clk, num_cycles=1, rising=True)
+                self.rx_wakeups += 1
+            pkt_bytes = bytes(await self._uart_sink.read(count=nb_bytes_expected))
+            await self._uart_sink.read(count=1) # crc8 byte
+            pkt: UartRxPckt = UartRxPckt(
+                rx_pkt_bytes=pkt_bytes,
+                uart_config=self.uart_config
+            )
+            if pkt.type == UartRxType.EVENT:
+                await self._tdc_queue.put(pkt)
+            else:
+                await self._reg_queue.put(pkt)
+
+
+class UartRxBenchEnvironment(BaseEnvironment):
+    """
+    Runs the same register traffic followed by an idle line with a given UART agent,
+    and reports the listener wake-ups per simulated millisecond and the wall time
+
+    Run a single one per simulation: a second environment would attach another
+    UartSink and clock to the same pins while the first ones keep running.
+
+    Args
+        agent_class: BaseUartAgent or PollingUartAgent
+        idle_us: time the line stays idle after the register traffic
+    """
+
+    def __init__(
+        self, dut: HierarchyObject, dut_config: DutConfig, uart_config: UartConfig,
+        agent_class: Type[BaseUartAgent], nb_transactions: int = 10, idle_us: int = 500,
+    ):
+        self._agent_class = agent_class
+        self._nb_transactions = nb_transactions
+        self._idle_us = idle_us
+        super(UartRxBenchEnvironment, self).__init__(
+            dut=dut,
+            dut_config=dut_config,
+            uart_config=uart_config,
+            logger_name=type(self).__qualname__
+        )
+
+    def _set_uart_agent(self, uart_config: UartConfig) -> BaseUartAgent:
+        return self._agent_class(uart_config)
+
+    async def _test(self, names: List[str] = []) -> None:
+        start_wall = perf_counter()
+        start_sim = get_sim_time(units='ns')
+        start_wakeups = self._uart_agent.rx_wakeups
+
+        for _ in range(self._nb_transactions):
+            await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=RegAddr.PRODUCT_VER_ID)
+        await Timer(self._idle_us, units='us')
+
+        wall = perf_counter() - start_wall
+        sim_ms = (get_sim_time(units='ns') - start_sim) / 10**6
+        wakeups = self._uart_agent.rx_wakeups - start_wakeups
+        self._log.info(
+            "%s: %i wake-ups in %.3f ms of sim time (%.1f per sim ms), %.3f s wall time",
+            self._agent_class.__qualname__, wakeups, sim_ms, wakeups / sim_ms, wall
+        )
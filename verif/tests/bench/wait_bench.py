@@ -0,0 +1,59 @@
+from time import perf_counter
+from typing import List, Optional, Type, Union
+from cocotb.handle import HierarchyObject
+from cocotb.triggers import ClockCycles
+from cocotb.utils import get_sim_time
+from base_environment import BaseEnvironment, DutConfig
+from base_uart_agent import BaseUartAgent, UartConfig, UartRxPckt
+
+POLL_CYCLES = 1000
+
+
+class PollingWaitUartAgent(BaseUartAgent):
+    """UART agent with the former response waits, polling the queues every 1000 clock cycles"""
+
+    async def _wait_for_response(self, timeout_cycles: int, timeout_time: Optional[int], timeout_units: str) -> Union[UartRxPckt, None]:
+        retries = timeout_cycles // POLL_CYCLES
+        try_counter = 1
+        while (try_counter < retries) and (self._reg_queue.qsize() < 1):
+            await ClockCycles(self._dut_clk, POLL_CYCLES, rising=True)
+            try_counter += 1
+
+        if try_counter == retries:
+            self._log.error("Timeout after a wait of %d clock cycles", timeout_cycles)
+            return None
+
+        pkt: UartRxPckt = await self._reg_queue.get()
+        return pkt
+
+    async def _wait_for_tdc(self, num_of_events: int, timeout_cycles: int, timeout_time: Optional[int], timeout_units: str) -> List[UartRxPckt]:
+        retries = timeout_cycles // POLL_CYCLES
+        pkts: List[UartRxPckt] = []
+        try_counter = 1
+        while (len(pkts) < num_of_events) and (try_counter < retries):
+            if self._tdc_queue.qsize() > 0:
+                pkts.append(await self._tdc_queue.get())
+            else:
+                await ClockCycles(self._dut_clk, POLL_CYCLES, rising=True)
+                try_counter += 1
+        return pkts
+
+
+def with_uart_agent(env_class: Type[BaseEnvironment], agent_class: Type[BaseUartAgent]) -> Type[BaseEnvironment]:
+    """Subclass of env_class driving the DUT through agent_class"""
+    class BenchEnvironment(env_class):
+        def _set_uart_agent(self, uart_config: UartConfig) -> BaseUartAgent:
+            return agent_class(uart_config)
+    BenchEnvironment.__qualname__ = env_class.__qualname__
+    return BenchEnvironment
+
+
+async def timed_run(env: BaseEnvironment, names: List[str]) -> dict:
+    """Runs env, returns the wall time and sim time it took"""
+    start_wall = perf_counter()
+    start_sim = get_sim_time(units='ns')
+    await env.run(names=names)
+    return dict(
+        wall_s=perf_counter() - start_wall,
+        sim_us=(get_sim_time(units='ns') - start_sim) / 10**3,
+    )
@@ -0,0 +1,20 @@
+from cocotb import test
+from bench.monitor_bench import monitor_wakeups, with_gated_monitors
+from bench.wait_bench import timed_run
+from tdc.tdc_environment import TDCEnvironment
+from base_environment import DutConfig
+from base_uart_agent import UartConfig
+
+
+# One monitor mode per simulation, compare the wake-ups it logs with the ones of bench_monitor_valid_gated
+@test()
+async def bench_monitor_per_clock(dut):
+    dut_config = DutConfig()
+    uart_config = UartConfig()
+    env = with_gated_monitors(TDCEnvironment, False)(dut, dut_config, uart_config)
+    result = await timed_run(env, ["SA.4"])
+    wakeups = monitor_wakeups(env)
+    dut._log.info(
+        "per clock: %i wake-ups of all monitors in %.1f us of sim time (%.1f per sim us), %.3f s wall time",
+        wakeups, result["sim_us"], wakeups / result["sim_us"], result["wall_s"]
+    )
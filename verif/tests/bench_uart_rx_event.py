@@ -0,0 +1,13 @@
+from cocotb import test
+from bench.uart_rx_bench_environment import UartRxBenchEnvironment
+from base_environment import DutConfig
+from base_uart_agent import UartConfig, BaseUartAgent
+
+
+# One listener per simulation, compare the wake-ups and wall time it logs
+# with the ones of bench_uart_rx_polling
+@test()
+async def bench_uart_rx_event(dut):
+    dut_config = DutConfig()
+    uart_config = UartConfig()
+    await UartRxBenchEnvironment(dut, dut_config, uart_config, BaseUartAgent).run()
@@ -0,0 +1,13 @@
+from cocotb import test
+from bench.uart_rx_bench_environment import UartRxBenchEnvironment, PollingUartAgent
+from base_environment import DutConfig
+from base_uart_agent import UartConfig
+
+
+# One listener per simulation, compare the wake-ups and wall time it logs
+# with the ones of bench_uart_rx_event
+@test()
+async def bench_uart_rx_polling(dut):
+    dut_config = DutConfig()
+    uart_config = UartConfig()
+    await UartRxBenchEnvironment(dut, dut_config, uart_config, PollingUartAgent).run()
@@ -0,0 +1,15 @@
+from cocotb import test
+from bench.wait_bench import with_uart_agent, timed_run
+from tdc.tdc_environment import TDCEnvironment
+from base_environment import DutConfig
+from base_uart_agent import UartConfig, BaseUartAgent
+
+
+# One agent per simulation, compare the times it logs with the ones of bench_wait_polling_tdc_SA_2
+@test()
+async def bench_wait_deadline_tdc_SA_2(dut):
+    dut_config = DutConfig()
+    uart_config = UartConfig()
+    env = with_uart_agent(TDCEnvironment, BaseUartAgent)(dut, dut_config, uart_config)
+    result = await timed_run(env, ["SA.2"])
+    dut._log.info("SA.2 with deadline waits: sim time %.1f us, wall time %.3f s", result["sim_us"], result["wall_s"])
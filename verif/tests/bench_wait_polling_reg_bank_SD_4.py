@@ -0,0 +1,15 @@
+from cocotb import test
+from bench.wait_bench import PollingWaitUartAgent, with_uart_agent, timed_run
+from reg_bank.reg_bank_environment import RegBankEnvironment
+from base_environment import DutConfig
+from base_uart_agent import UartConfig
+
+
+# One agent per simulation, compare the times it logs with the ones of bench_wait_deadline_reg_bank_SD_4
+@test()
+async def bench_wait_polling_reg_bank_SD_4(dut):
+    dut_config = DutConfig()
+    uart_config = UartConfig()
+    env = with_uart_agent(RegBankEnvironment, PollingWaitUartAgent)(dut, dut_config, uart_config)
+    result = await timed_run(env, ["SD.4"])
+    dut._log.info("SD.4 with polling waits: sim time %.1f us, wall time %.3f s", result["sim_us"], result["wall_s"])
@@ -1,4 +1,5 @@
 from typing import List
+from logging import Logger
 from base_environment import BaseEnvironment, DutConfig
 from base_uart_agent import UartConfig, UartTxCmd, BaseUartAgent
 from crc8.crc8_mmc import CRC8MMC
@@ -36,7 +37,7 @@ class CRC8Environment(BaseEnvironment):
         test_fail = 0
         test_count = 0
         for name in names :
-            test_fail += await self.test_dict[name]()
+            test_fail += await self._run_test(name)
             test_count += 1
             await self.reset()
         
@@ -49,13 +50,18 @@ class CRC8Environment(BaseEnvironment):
         await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=RegAddr.PRODUCT_VER_ID)
         await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=RegAddr.TDC_THRESH)
         await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=RegAddr.EN_EVENT_COUNT_RATE)
-        if(self._mmc_list[0].error_count != 0):
-            return 1
-        return 0
+        return self.error_handling(self._log)
 
     async def _test_crc8_SD_3(self) -> None:
         self._uart_agent.crc8_offset = 1
         await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=RegAddr.PRODUCT_VER_ID)
-        if(self._mmc_list[0].error_count != 0):
+        return self.error_handling(self._log)
+
+    def error_handling(self, logger: Logger) -> int:
+        # the batch mode checks the frames recorded so far only when asked, and the
+        # frames never answered only count once the scoreboard is flushed
+        self._mmc_list[0].finish()
+        if(self._mmc_list[0].error_count):
+            logger.error("MMC FAIL : %i wrong values for o_match", self._mmc_list[0].error_count)
             return 1
         return 0
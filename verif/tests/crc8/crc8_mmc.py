@@ -3,18 +3,51 @@
 
 # adapted from https://github.com/cocotb/cocotb/blob/stable/1.9/examples/matrix_multiplier/tests/test_matrix_multiplier.py
 
-from typing import Dict, List, Tuple
+from typing import Tuple
+import numpy as np
 from cocotb.handle import SimHandleBase
+from cocotb.utils import get_sim_time
 from crc8.crc8_monitor import CRC8OutputMonitor, CRC8InputMonitor
 from base_mmc import BaseMMC
 from base_monitor import BaseMonitor
 from base_model import BaseModel
+from crc import crc8_batch
+from scoreboard import Scoreboard, Verdict
+
+MAX_FRAME_SIZE = 16
 
 class CRC8MMC(BaseMMC):
 
-    def __init__(self, model: BaseModel, logicblock_instance: SimHandleBase):
+    def __init__(
+        self,
+        model: BaseModel,
+        logicblock_instance: SimHandleBase,
+        batch: bool = False,
+        capacity: int = 1024,
+        checkpoint: int = 0,
+    ):
+        """
+        Args
+            batch: record frames during the run and check them all at once,
+                at every checkpoint frames (0 disables checkpoints) and on stop()
+            capacity: initial number of frames preallocated in batch mode
+        """
+        self._batch: bool = batch
+        self._capacity: int = capacity
         super(CRC8MMC, self).__init__(model=model, logicblock_instance=logicblock_instance, logger_name=type(self).__qualname__)
         self.error_count: int = 0
+        self._checkpoint: int = checkpoint
+        # only the batch mode records frames
+        capacity = capacity if batch else 0
+        self._frames: np.ndarray = np.zeros((capacity, MAX_FRAME_SIZE), dtype=np.uint8)
+        self._lengths: np.ndarray = np.zeros(capacity, dtype=np.int32)
+        self._sim_time: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self._frame_count: int = 0
+        self._checked_count: int = 0
+        self._row_length: int = 0   # bytes recorded of the frame being received
+        self._unmatched: int = 0    # frames and o_done left unpaired, as counted by finish()
+        # o_done comes once per frame, in order
+        self._scoreboard = Scoreboard(self._log, fields=("o_match",))
 
     def _set_monitors(self) -> Tuple[BaseMonitor, BaseMonitor]:
         input_mon: BaseMonitor = CRC8InputMonitor(
@@ -26,47 +59,141 @@ class CRC8MMC(BaseMMC):
         output_mon: BaseMonitor = CRC8OutputMonitor(
             clk=self._logicblock.clk,
             valid=self._logicblock.o_done,
-            datas=dict(o_match=self._logicblock.o_match, reset=self._logicblock.reset)
+            datas=dict(o_match=self._logicblock.o_match, reset=self._logicblock.reset),
+            # in batch mode o_match is only read by check(), straight from the columns
+            columns=self._capacity if self._batch else 0
         )
         return input_mon, output_mon
 
+    def _run_model(self) -> None:
+        """Feeds the model every byte seen so far, the last byte of a frame is the crc"""
+        while not self._input_mon.values.empty():
+            mon_sample = self._input_mon.values.get_nowait()
+            if mon_sample.i_last == 1:
+                self._scoreboard.expect("frame", (self._model.crc8_check(mon_sample.i_data),))
+            else:
+                self._model.crc8_update(mon_sample.i_data)
+
     # Insert logic to decide when to check the model against the HDL result.
     # then compare output monitor result with model result
     # This example might not work every time.
     async def _checker(self) -> None:
+        if self._batch:
+            await self._recorder()
         while True:
             # # dummy await, allows to run without checker implementation and verify monitors
             # await ClockCycles(self._logicblock.clk, 1000, rising=True)
 
-            mon_samples: List[Dict[str, int]] = []
-            while True:
-                mon_samples.append((await self._input_mon.values.get()))
-                if mon_samples[len(mon_samples)-1]["i_last"] == 1:
-                     break
-
-            bytes_aray: bytes = bytes([sample['i_data'] for sample in mon_samples])
-
-            o_match_model = self._model.crc8(bytes_aray)
-
             o_match_logicblock = await self._output_mon.values.get()
 
+            self._run_model()
+
             # self._log.info("o_match_logicblock = %s", o_match_logicblock)
 
-            try:
-                assert o_match_model == o_match_logicblock['o_match']
-            except AssertionError:
-                self._log.error(
-                    "model expected o_match = %i, but got o_match = %i",
-                    o_match_model,
-                    o_match_logicblock['o_match']
-                )
+            if self._scoreboard.actual("frame", (o_match_logicblock.o_match,)) is not Verdict.MATCH:
                 self.error_count+=1
 
-            #while not self._input_mon.values.empty():
-                #self._input_mon.values.get_nowait()
-
-            #while not self._output_mon.values.empty():
-                #continue
+    async def _recorder(self) -> None:
+        """Batch mode checker, only stores each frame, the output monitor stores its o_match"""
+        while True:
+            if self._frame_count == self._lengths.shape[0]:
+                self._grow()
+            row: np.ndarray = self._frames[self._frame_count]
+            self._row_length = 0
+            while True:
+                mon_sample = await self._input_mon.values.get()
+                if self._row_length < MAX_FRAME_SIZE:
+                    row[self._row_length] = mon_sample.i_data
+                self._row_length += 1
+                if mon_sample.i_last == 1:
+                    break
+            length = self._row_length
+            if length > MAX_FRAME_SIZE:
+                self._log.error("frame of %i bytes truncated to %i bytes", length, MAX_FRAME_SIZE)
+                length = MAX_FRAME_SIZE
+
+            self._lengths[self._frame_count] = length
+            self._sim_time[self._frame_count] = get_sim_time(units="ps")
+            self._frame_count += 1
+
+            if self._checkpoint and self._frame_count - self._checked_count >= self._checkpoint:
+                self.check()
+
+    def _grow(self) -> None:
+        capacity = 2 * self._lengths.shape[0]
+        self._frames = np.resize(self._frames, (capacity, MAX_FRAME_SIZE))
+        self._lengths = np.resize(self._lengths, capacity)
+        self._sim_time = np.resize(self._sim_time, capacity)
+
+    def check(self) -> int:
+        """Checks every frame recorded since the last check, returns the number of mismatches"""
+        if not self._batch:
+            return 0
+        # a frame is complete once the CRC8 raised o_done for it
+        start, end = self._checked_count, min(self._frame_count, len(self._output_mon.columns))
+        if end <= start:
+            return 0
+        self._checked_count = end
+        o_match = self._output_mon.columns["o_match"][start:end]
+
+        frames = self._frames[start:end]
+        lengths = self._lengths[start:end]
+        rows = np.arange(end - start)
+        crcs = crc8_batch(frames, lengths - 1)
+        o_match_model = (crcs == frames[rows, lengths - 1]).astype(np.uint8)
+
+        mismatches = np.flatnonzero(o_match_model != o_match)
+        for index in mismatches:
+            self._log.error(
+                "frame %i @ %i ps: model expected o_match = %i, but got o_match = %i, frame = %s",
+                start + index,
+                self._sim_time[start + index],
+                o_match_model[index],
+                o_match[index],
+                frames[index, :lengths[index]].tobytes().hex()
+            )
+        self.error_count += len(mismatches)
+        return len(mismatches)
+
+    def finish(self) -> int:
+        """
+        End of test check, to call before the verdict: checks the recorded frames and
+        counts in error_count every frame without o_done, and every o_done without a frame
+        """
+        if not self._batch:
+            self._run_model()
+            missing = self._scoreboard.flush()
+            self.error_count += missing
+            return missing
+
+        self.check()
+        done = len(self._output_mon.columns)
+        unmatched = abs(self._frame_count - done)
+        # the frames are kept across resets, only count what changed since the last call
+        new = max(unmatched - self._unmatched, 0)
+        self._unmatched = unmatched
+        if new and self._frame_count > done:
+            self._log.error("%i frames never raised o_done", new)
+        elif new:
+            self._log.error("o_done raised %i times without a frame", new)
+        self.error_count += new
+        return new
+
+    def stop(self) -> None:
+        super(CRC8MMC, self).stop()
+        self.check()
+        if self._batch:
+            self._log.info("checked %i frames in batch mode", self._frame_count)
 
     async def reset(self):
+        await super(CRC8MMC, self).reset()
+        if self._row_length:
+            self._log.info("%i bytes of a frame discarded on reset", self._row_length)
+        # the bytes of the frame cut by the reset were drained, restart the row
+        self._row_length = 0
+        self.check()
+        if not self._batch:
+            self._scoreboard.flush()
+            self._scoreboard.report()
+            self._scoreboard.clear()
         self.error_count=0
@@ -6,30 +6,25 @@ from typing import Dict
 
 class CRC8InputMonitor(BaseMonitor):
     def __init__(self, clk: SimHandleBase, valid: SimHandleBase, datas: Dict[str, SimHandleBase]):
-        super(CRC8InputMonitor, self).__init__(clk, datas, logger_name=type(self).__qualname__)
+        super(CRC8InputMonitor, self).__init__(clk, datas, logger_name=type(self).__qualname__, records=True)
         self._valid = valid
 
     async def _run(self) -> None:
-        while True:
-            await RisingEdge(self._clk)
-            # this condition decides when to record the signal states
-            if self._valid.value.binstr != "1":
-                # skip whatever comes after, and start the while loop again
-                continue
-            # store the samples, as formatted by the _sample method
-            self.values.put_nowait(self._sample())
+        # samples every clock cycle where i_valid is high
+        await self._run_data_valid(self._valid)
 
 class CRC8OutputMonitor(BaseMonitor):
-    def __init__(self, clk: SimHandleBase, valid: SimHandleBase, datas: Dict[str, SimHandleBase]):
-        super(CRC8OutputMonitor, self).__init__(clk, datas, logger_name=type(self).__qualname__)
+    def __init__(self, clk: SimHandleBase, valid: SimHandleBase, datas: Dict[str, SimHandleBase], columns: int = 0):
+        super(CRC8OutputMonitor, self).__init__(clk, datas, logger_name=type(self).__qualname__, records=True, columns=columns)
         self._valid = valid
 
     async def _run(self) -> None:
         while True:
             await RisingEdge(self._valid)
+            self.wakeups += 1
             # this condition decides when to record the signal states
             if self._valid.value.binstr != "1":
                 # skip whatever comes after, and start the while loop again
                 continue
             # store the samples, as formatted by the _sample method
-            self.values.put_nowait(self._sample())
+            await self._store(self._sample())
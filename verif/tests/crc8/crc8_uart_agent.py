@@ -1,4 +1,6 @@
-from base_uart_agent import BaseUartAgent, UartConfig
+from typing import Hashable
+from base_uart_agent import BaseUartAgent, UartConfig, UartTxCmd, RegAddr
+from crc import corrupt
 
 class CRC8UartAgent(BaseUartAgent):
     def __init__(self, uart_config: UartConfig):
@@ -15,6 +17,9 @@ class CRC8UartAgent(BaseUartAgent):
             raise TypeError("property crc8_offset must be of type int")
         self._crc8_offset: int = offset
 
+    def _frame_key(self, cmd: UartTxCmd, addr: RegAddr, data: int) -> Hashable:
+        return (cmd, addr, data, self.crc8_offset)
+
     def _calc_crc8(self, bytes_array: bytes) -> int:
-        altered_crc8: int = super(CRC8UartAgent, self)._calc_crc8(bytes_array) + self.crc8_offset
+        altered_crc8: int = corrupt(super(CRC8UartAgent, self)._calc_crc8(bytes_array), self.crc8_offset)
         return altered_crc8
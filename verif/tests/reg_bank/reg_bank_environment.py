@@ -1,6 +1,7 @@
-from typing import Tuple, List
+from typing import Optional, Sequence, Tuple, List
+import numpy as np
 from base_environment import BaseEnvironment, DutConfig
-from base_uart_agent import RegAddr, UartConfig, UartTxCmd, BaseUartAgent, UartRxPckt
+from base_uart_agent import RegAddr, UartConfig, UartTxCmd, BaseUartAgent, UartRxPckt, UartTransaction, diff_results
 from reg_bank.reg_bank_mmc import RegBankMMC
 from cocotb.handle import HierarchyObject
 from base_model import BaseModel
@@ -21,9 +22,12 @@ class RegBankEnvironment(BaseEnvironment):
         )
         self.test_dict = {
             'SA.6' : self._test_SA_6,
+            'SA.6.P' : self._test_SA_6_pipelined,
             'SD.4' : self._test_SD_4,
             'SD.5' : self._test_SD_5
         }
+        # predicts the responses of write_many and read_many, in the order they are sent
+        self._reg_model = BaseModel()
 
     def _set_uart_agent(self, uart_config: UartConfig) -> BaseUartAgent:
         return BaseUartAgent(uart_config)
@@ -39,11 +43,16 @@ class RegBankEnvironment(BaseEnvironment):
             logicblock_instance=self._dut.inst_packet_merger.inst_crc_calc
         ))
 
+    async def reset(self) -> None:
+        await super(RegBankEnvironment, self).reset()
+        # the DUT registers are back to their reset values, so are the predicted ones
+        self._reg_model = BaseModel()
+
     async def _test(self, names: List[str]) -> None:
         test_fail = 0
         test_count = 0
         for name in names:
-            test_fail += await self.test_dict[name]()
+            test_fail += await self._run_test(name)
             test_count += 1
             await self.reset()
 
@@ -59,29 +68,45 @@ class RegBankEnvironment(BaseEnvironment):
             cmd=UartTxCmd.READ,
             addr=RegAddr.PRODUCT_VER_ID
         )
-        assert response.data == hex(0xBADEFACE)
+        assert response.data == 0xBADEFACE
         return 0
 
     async def _test_rwr_thresh(self) -> int:
         response = await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=RegAddr.TDC_THRESH)
-        assert response.data == hex(0x00000000)
+        assert response.data == 0x00000000
         await self._uart_agent.transaction(cmd=UartTxCmd.WRITE, addr=RegAddr.TDC_THRESH, data=0xBEE)
         response = await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=RegAddr.TDC_THRESH)
-        assert response.data == hex(0xBEE)
+        assert response.data == 0xBEE
         return 0
 
     async def _test_rwr_cnt_rate(self) -> int:
         current_val = await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=RegAddr.EN_COUNT_RATE)
-        assert current_val.data in [hex(0x0), hex(0x1)]
-        if current_val.data == hex(0x0):
+        assert current_val.data in [0x0, 0x1]
+        if current_val.data == 0x0:
             future_val = 1
-        elif current_val.data == hex(0x1):
+        elif current_val.data == 0x1:
             future_val = 0
         await self._uart_agent.transaction(cmd=UartTxCmd.WRITE, addr=RegAddr.EN_COUNT_RATE, data=future_val)
         final_response = await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=RegAddr.EN_COUNT_RATE)
-        assert final_response.data == hex(future_val)
+        assert final_response.data == future_val
         return 0
     
+    def _diff_many(
+        self, results: np.ndarray, cmd: UartTxCmd, addrs: Sequence[RegAddr], test_log: Logger,
+        data: Optional[Sequence[int]] = None
+    ) -> int:
+        """Diffs the results of write_many or read_many against the model, returns the wrong responses"""
+        predicted = self._reg_model.register_bank_many(
+            read_enable=int(cmd == UartTxCmd.READ),
+            write_enable=int(cmd == UartTxCmd.WRITE),
+            addresses=[addr.value for addr in addrs],
+            write_data=data
+        )
+        wrong = diff_results(results, cmd, predicted, test_log)
+        if wrong:
+            test_log.error("%i of %i %s responses were wrong", wrong, len(results), cmd)
+        return wrong
+
     async def _test_SA_6(self) -> None:
         test_name = "test_SA_6"
         test_log = SimLog("cocotb.%s" % test_name)
@@ -100,15 +125,42 @@ class RegBankEnvironment(BaseEnvironment):
             (RegAddr.CHANNEL_EN_BITS, randint(0, 2**32)),
         ]
 
-        for value in values:
-            await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=value[0], data=value[1])
-            await self._uart_agent.transaction(cmd=UartTxCmd.WRITE, addr=value[0], data=value[1])
-            await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=value[0], data=value[1])
-        
+        addrs = [value[0] for value in values]
+        data = [value[1] for value in values]
+        wrong = self._diff_many(await self._uart_agent.read_many(addrs), UartTxCmd.READ, addrs, test_log)
+        wrong += self._diff_many(await self._uart_agent.write_many(addrs, data), UartTxCmd.WRITE, addrs, test_log, data)
+        wrong += self._diff_many(await self._uart_agent.read_many(addrs), UartTxCmd.READ, addrs, test_log)
         
         test_log.info("Finished %s" % test_name)
-        return self.error_handling(test_log)
+        return self.error_handling(test_log) or int(wrong > 0)
+
+
+    async def _test_SA_6_pipelined(self) -> int:
+        test_name = "test_SA_6_pipelined"
+        test_log = SimLog("cocotb.%s" % test_name)
+        test_log.info("Starting %s" % test_name)
 
+        transactions: List[UartTransaction] = []
+        for addr in RegAddr:
+            value = randint(0, 2**32 - 1)
+            transactions.append(UartTransaction(cmd=UartTxCmd.READ, addr=addr, data=value))
+            transactions.append(UartTransaction(cmd=UartTxCmd.WRITE, addr=addr, data=value))
+            transactions.append(UartTransaction(cmd=UartTxCmd.READ, addr=addr, data=value))
+
+        # Keep 4 commands in flight to stress the CommandManager with back to back frames
+        await self._uart_agent.transaction_batch(transactions, window=4)
+
+        failed = [tr for tr in transactions if tr.error is not None]
+        latencies = [tr.latency for tr in transactions if tr.latency is not None]
+        if latencies:
+            test_log.info("latency min/max = %i/%i ns", min(latencies), max(latencies))
+
+        test_log.info("Finished %s" % test_name)
+        if failed:
+            test_log.error("%i of %i pipelined transactions failed", len(failed), len(transactions))
+            self.error_handling(test_log)
+            return 1
+        return self.error_handling(test_log)
 
     async def _test_SD_4(self) -> int:
         test_name = "test_SD_4"
@@ -128,8 +180,7 @@ class RegBankEnvironment(BaseEnvironment):
             RegAddr.PRODUCT_VER_ID
         ]
 
-        for reg in reg_list:
-            await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=reg)
+        wrong = self._diff_many(await self._uart_agent.read_many(reg_list), UartTxCmd.READ, reg_list, test_log)
 
         values: List[Tuple[RegAddr, int]] = [
             (RegAddr.TDC_THRESH, 0xFFFFFFFF),
@@ -142,12 +193,17 @@ class RegBankEnvironment(BaseEnvironment):
             (RegAddr.CHANNEL_EN_BITS, 0xFFFF)
         ]
 
-        for value in values:
-            await self._uart_agent.transaction(cmd=UartTxCmd.WRITE, addr=value[0], data=value[1])
-            await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=value[0], data=value[1])
+        addrs = [value[0] for value in values]
+        data = [value[1] for value in values]
+        wrong += self._diff_many(await self._uart_agent.write_many(addrs, data), UartTxCmd.WRITE, addrs, test_log, data)
+        results = await self._uart_agent.read_many(addrs)
+        wrong += self._diff_many(results, UartTxCmd.READ, addrs, test_log)
+        latencies = results["latency"][results["latency"] >= 0]
+        if len(latencies):
+            test_log.info("read latency min/max = %i/%i ns", latencies.min(), latencies.max())
         
         test_log.info("Finished %s" % test_name)
-        return self.error_handling(test_log)
+        return self.error_handling(test_log) or int(wrong > 0)
     
     async def _test_SD_5(self) -> int:
         test_name = "test_SD_5"
@@ -166,15 +222,18 @@ class RegBankEnvironment(BaseEnvironment):
             (RegAddr.CHANNEL_EN_BITS, 0xFFFFFFFF),
         ]
 
-        for value in values:
-            await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=value[0], data=value[1])
-            await self._uart_agent.transaction(cmd=UartTxCmd.WRITE, addr=value[0], data=value[1])
-            await self._uart_agent.transaction(cmd=UartTxCmd.READ, addr=value[0], data=value[1])
+        addrs = [value[0] for value in values]
+        data = [value[1] for value in values]
+        wrong = self._diff_many(await self._uart_agent.read_many(addrs), UartTxCmd.READ, addrs, test_log)
+        wrong += self._diff_many(await self._uart_agent.write_many(addrs, data), UartTxCmd.WRITE, addrs, test_log, data)
+        wrong += self._diff_many(await self._uart_agent.read_many(addrs), UartTxCmd.READ, addrs, test_log)
         
         test_log.info("Finished %s" % test_name)
-        return self.error_handling(test_log)
+        return self.error_handling(test_log) or int(wrong > 0)
 
     def error_handling(self, logger: Logger) -> int:
+        # the accesses never answered only count once the scoreboard is flushed
+        self._mmc_list[0].finish()
         if(self._mmc_list[0].error_count):
             logger.error("MMC FAIL : %i wrong values for readData or ackWrite", self._mmc_list[0].error_count)
             return 1
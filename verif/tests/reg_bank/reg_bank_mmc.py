@@ -3,18 +3,21 @@
 
 # adapted from https://github.com/cocotb/cocotb/blob/stable/1.9/examples/matrix_multiplier/tests/test_matrix_multiplier.py
 
-from typing import Dict, List, Tuple
+from typing import List, Tuple
 from cocotb.handle import SimHandleBase
 from reg_bank.reg_bank_monitor import RegBankOutputMonitor, RegBankInputMonitor
 from base_mmc import BaseMMC
 from base_monitor import BaseMonitor
 from base_model import BaseModel
+from scoreboard import Scoreboard, Verdict
 
 class RegBankMMC(BaseMMC):
     def __init__(self, model: BaseModel, logicblock_instance: SimHandleBase):
         super(RegBankMMC, self).__init__(model=model, logicblock_instance=logicblock_instance, logger_name=type(self).__qualname__)
         self.error_count: int = 0
         self.response_count: int = 0
+        # reads and writes are answered in order, each on their own signal
+        self._scoreboard = Scoreboard(self._log, fields=("writeAck", "readData"))
 
     def _set_monitors(self) -> Tuple[BaseMonitor, BaseMonitor]:
         input_mon: BaseMonitor = RegBankInputMonitor(
@@ -41,6 +44,22 @@ class RegBankMMC(BaseMMC):
         )
         return input_mon, output_mon
 
+    def _run_model(self) -> None:
+        """Feeds the model every access seen so far, expecting one response each"""
+        while not self._input_mon.values.empty():
+            in_mon_samples = self._input_mon.values.get_nowait()
+            write_ack_model, read_data_model = self._model.register_bank(
+                write_enable=in_mon_samples.writeEnable,
+                read_enable=in_mon_samples.readEnable,
+                address=in_mon_samples.address,
+                write_data=in_mon_samples.writeData
+            )
+            # self._log.info("write_ack_model = %s, read_data_model = %s", hex(write_ack_model), hex(read_data_model))
+            self._scoreboard.expect(
+                "write" if in_mon_samples.writeEnable else "read",
+                (write_ack_model, read_data_model)
+            )
+
     # Insert logic to decide when to check the model against the HDL result.
     # then compare output monitor result with model result
     # This example might not work every time.
@@ -49,61 +68,34 @@ class RegBankMMC(BaseMMC):
             # # dummy await, allows to run without checker implementation and verify monitors
             # await ClockCycles(self._logicblock.clk, 1000, rising=True) 
 
-            in_mon_samples: Dict[str, int] = {}
-            out_mon_samples: Dict[str, int] = {}
-            
-            in_mon_samples = await self._input_mon.values.get()
-            
-            write_enable: int = in_mon_samples["writeEnable"]
-            read_enable: int = in_mon_samples["readEnable"]
-            address: int = in_mon_samples["address"]
-            write_data: int = in_mon_samples["writeData"]
-            
-            # self._log.info(
-            #     "write_enable = %s, read_enable = %s, address = %s, write_data = %s",
-            #     hex(write_enable), hex(read_enable),
-            #     hex(address), hex(write_data)
-            # )
-            
-            model_output: Tuple[int, int] = self._model.register_bank(
-                write_enable=write_enable,
-                read_enable=read_enable,
-                address=address,
-                write_data=write_data
-            )
-            # self._log.info("model_output = %s", model_output)
-            write_ack_model = model_output[0]
-            read_data_model = model_output[1]
-
             out_mon_samples = await self._output_mon.values.get()
-            
-            write_ack_mon: int = out_mon_samples["writeAck"]
-            read_data_mon: int = out_mon_samples["readData"]
 
-            # self._log.info("write_ack_mon = %s, read_data_mon = %s", hex(write_ack_mon), hex(read_data_mon))
-            # self._log.info("write_ack_model = %s, read_data_model = %s", hex(write_ack_model), hex(read_data_model))
-            try:
-                self.response_count += 1
-                assert (hex(write_ack_model) == hex(write_ack_mon))
-            except AssertionError:
-                self._log.error(
-                    "%i. model expected writeAck = %s, but received writeAck = %s",
-                    self.response_count,
-                    hex(write_ack_model),
-                    hex(write_ack_mon)
-                )
-                self.error_count += 1
-            try:
-                self.response_count += 1
-                assert hex(read_data_model) == hex(read_data_mon)
-            except AssertionError:
-                self._log.error(
-                    "%i. model expected readData = %s, but received readData = %s",
-                    self.response_count,
-                    hex(read_data_model),
-                    hex(read_data_mon)
-                )
+            # the accesses always come before their response, model every one seen so far
+            self._run_model()
+
+            # self._log.info("write_ack_mon = %s, read_data_mon = %s", hex(out_mon_samples.writeAck), hex(out_mon_samples.readData))
+            self.response_count += 1
+            verdict = self._scoreboard.actual(
+                "write" if out_mon_samples.writeAck else "read",
+                (out_mon_samples.writeAck, out_mon_samples.readData)
+            )
+            if verdict is not Verdict.MATCH:
                 self.error_count += 1
 
+    def finish(self) -> int:
+        """
+        End of test check, to call before the verdict: every access left without a
+        response is counted in error_count. Returns their number.
+        """
+        self._run_model()
+        missing = self._scoreboard.flush()
+        self.error_count += missing
+        return missing
+
     async def reset(self):
+        await super(RegBankMMC, self).reset()
+        self._scoreboard.flush()
+        self._scoreboard.report()
+        self._scoreboard.clear()
         self.error_count = 0
+        self.response_count = 0
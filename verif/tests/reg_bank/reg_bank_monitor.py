@@ -6,7 +6,7 @@ from cocotb.handle import SimHandleBase
 
 class RegBankInputMonitor(BaseMonitor):
     def __init__(self, clk: SimHandleBase, read_enable: SimHandleBase, write_enable: SimHandleBase, reset: SimHandleBase, datas: Dict[str, SimHandleBase]):
-        super(RegBankInputMonitor, self).__init__(clk, datas, logger_name=type(self).__qualname__)
+        super(RegBankInputMonitor, self).__init__(clk, datas, logger_name=type(self).__qualname__, records=True)
         self.read_enable: SimHandleBase = read_enable
         self.write_enable: SimHandleBase = write_enable
         self.reset: SimHandleBase = reset
@@ -14,6 +14,7 @@ class RegBankInputMonitor(BaseMonitor):
     async def _run(self) -> None:
         while True:
             await First(RisingEdge(self.read_enable), RisingEdge(self.write_enable))
+            self.wakeups += 1
             
             if self.write_enable.value.binstr == self.read_enable.value.binstr:
                 continue
@@ -22,11 +23,11 @@ class RegBankInputMonitor(BaseMonitor):
                 continue
      
             # store the samples, as formatted by the _sample method
-            self.values.put_nowait(self._sample())
+            await self._store(self._sample())
 
 class RegBankOutputMonitor(BaseMonitor):
     def __init__(self, clk: SimHandleBase, read_enable: SimHandleBase, write_ack: SimHandleBase, reset: SimHandleBase, datas: Dict[str, SimHandleBase]):
-        super(RegBankOutputMonitor, self).__init__(clk, datas, logger_name=type(self).__qualname__)
+        super(RegBankOutputMonitor, self).__init__(clk, datas, logger_name=type(self).__qualname__, records=True)
         self._read_enable = read_enable
         self._write_ack = write_ack
         self.read_event: Event = Event()
@@ -36,6 +37,7 @@ class RegBankOutputMonitor(BaseMonitor):
     async def _run(self) -> None:
         while True:
             await First(RisingEdge(self._read_enable), RisingEdge(self._write_ack))
+            self.wakeups += 1
 
             if self._write_ack.value.binstr == self._read_enable.value.binstr:
                 continue
@@ -46,8 +48,9 @@ class RegBankOutputMonitor(BaseMonitor):
             if self._read_enable.value.binstr == '1':
                 # self._log.info("readEnable sampled")
                 await ClockCycles(self._clk, num_cycles=2, rising=True)
+                self.wakeups += 1
             # else:
             #     self._log.info("writeAck sampled")
 
             # store the samples, as formatted by the _sample method
-            self.values.put_nowait(self._sample())
+            await self._store(self._sample())
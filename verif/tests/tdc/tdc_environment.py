@@ -1,19 +1,43 @@
-from typing import List
-from cocotb.handle import HierarchyObject
+import json
+from dataclasses import asdict, dataclass
+from os import environ
+from typing import Dict, List, Optional
+from cocotb.handle import HierarchyObject, ModifiableObject
 from base_environment import BaseEnvironment, DutConfig
 from base_uart_agent import UartConfig, UartTxCmd, UartRxPckt, UartRxType
 from base_trigger_agent import BaseTriggerAgent, PulseConfig, TDCChannel
 from tdc.tdc_mmc import TDCMMC
 from base_model import BaseModel, RegAddr
-from cocotb.triggers import ClockCycles, Timer
+from cocotb.triggers import ClockCycles, RisingEdge, Timer
 from random import randint
-from cocotb import start_soon
+from cocotb import start_soon, Task
 from crc8.crc8_mmc import CRC8MMC
 from reg_bank.reg_bank_mmc import RegBankMMC
 from cocotb.log import SimLog
+from cocotb.utils import get_sim_time
+from tdc_model import expected_tdc_outputs
+import numpy as np
+from trace_recorder import TraceRecorder
+from sipm_stimulus import SiPMConfig, sipm_array_pulses, stimulus_rng
 
 INTRPLT_DLY = 2010
 
+EVENT_PACKETS = 2       # UART EVENT packets per TDC event
+SWEEP_EVENTS = 64       # events sent per channel at each rate of the saturation sweep
+SWEEP_STEPS = (0.125, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 4.0)  # rates, as fractions of the UART limit
+LOSS_TOLERANCE = 0.01   # loss above which a rate is not sustained
+QUIET_PACKETS = 4       # packet times without any EVENT packet for the path to be drained
+
+@dataclass
+class SweepPoint:
+    rate_hz: float      # per channel
+    triggers: int       # pulses sent
+    expected: int       # TDC events the model derives from the pulses
+    received: int       # TDC events received over the UART
+    loss: float
+    backlog_us: float   # from the last trigger to the last EVENT packet
+    fifo_full: int      # times the FIFO filled up
+
 class TDCEnvironment(BaseEnvironment):
     def __init__(
         self, dut: HierarchyObject, dut_config: DutConfig, uart_config: UartConfig,
@@ -32,7 +56,9 @@ class TDCEnvironment(BaseEnvironment):
                           'SA.1' : self._test_SA_1,
                           'SA.2' : self._test_SA_2,
                           'SA.3' : self._test_SA_3,
-                          'SA.4' : self._test_SA_4}
+                          'SA.4' : self._test_SA_4,
+                          'SW.1' : self._test_SW_1,
+                          'SW.2' : self._test_SW_2}
     
     def _build_env(self) -> None:
         super(TDCEnvironment, self)._build_env()
@@ -48,18 +74,28 @@ class TDCEnvironment(BaseEnvironment):
         ))
         self._mmc_list.append(CRC8MMC(
             model=BaseModel(),
-            logicblock_instance=self._dut.inst_packet_merger.inst_crc_calc
+            logicblock_instance=self._dut.inst_packet_merger.inst_crc_calc,
+            batch=True
         ))
         self._mmc_list.append(RegBankMMC(
             model=BaseModel(),
             logicblock_instance=self._dut.registers_dut
         ))
 
+    def _counters(self) -> Dict[str, int]:
+        counters = super(TDCEnvironment, self)._counters()
+        counters["trigger_edges"] = self.trigger_agent.edges_driven
+        return counters
+
+    def _attach_trace(self, recorder: TraceRecorder) -> None:
+        super(TDCEnvironment, self)._attach_trace(recorder)
+        self.trigger_agent.attach_trace(recorder)
+
     async def _test(self, names : List[str]) -> None:
         test_fail = 0
         test_count = 0
         for name in names:
-           test_fail += await self.test_dict[name]()
+           test_fail += await self._run_test(name)
            test_count += 1
            await self.reset()
             
@@ -67,6 +103,13 @@ class TDCEnvironment(BaseEnvironment):
         self._log.info("Ran %i tests with %i FAIL", test_count, test_fail)
         assert test_fail == 0
 
+    async def _send_precomputed_pulses(self, pulses: List[PulseConfig], units: str = "ns") -> None:
+        """Sends pulses, the TDC MMCs check against outputs computed up front instead of edge by edge"""
+        expected = expected_tdc_outputs(pulses, units=units, start_ps=round(get_sim_time(units='ps')))
+        for channel in TDCChannel:
+            self._mmc_list[channel.value].load_expected(expected.get(channel, np.zeros((0, 2), dtype=np.int64)))
+        await self.trigger_agent.send_pulses(pulses, units=units)
+
     async def _test_init(self) -> None:
         response_ch0: UartRxPckt = await self._uart_agent.transaction(
             cmd=UartTxCmd.WRITE,
@@ -237,7 +280,7 @@ class TDCEnvironment(BaseEnvironment):
             timestamp+=rand_width+INTRPLT_DLY
 
         # Sending the pulses on the trigger signal
-        start_soon(self.trigger_agent.send_pulses(rand_pulses, units='ns'))
+        start_soon(self._send_precomputed_pulses(rand_pulses, units='ns'))
 
         # Waiting for the DUT to transeive the TDC interpolation 
         pkts: List[UartRxPckt] = await self._uart_agent.tdc_transaction(num_events=20)
@@ -251,6 +294,158 @@ class TDCEnvironment(BaseEnvironment):
             test_log.info("SUCCESS")
             return 0
 
+    def _uart_event_rate(self) -> float:
+        """Most TDC events per second the UART can carry, start, stop and CRC byte included"""
+        uart_config = self._uart_agent.uart_config
+        bits_per_packet = (uart_config.packet_size // uart_config.frame_size + 1) * (uart_config.frame_size + 2)
+        return uart_config.baud_rate / (bits_per_packet * EVENT_PACKETS)
+
+    async def _count_fifo_full(self, full: ModifiableObject, counter: List[int]) -> None:
+        while True:
+            await RisingEdge(full)
+            counter[0] += 1
+
+    async def _drain_events(self, poll_ns: int) -> int:
+        """Waits until no EVENT packet came for QUIET_PACKETS polls, returns the ns to the last one"""
+        start = get_sim_time(units='ns')
+        last = start
+        rx_events = self._uart_agent.rx_events
+        quiet = 0
+        while quiet < QUIET_PACKETS:
+            await Timer(poll_ns, units='ns')
+            if self._uart_agent.rx_events != rx_events:
+                rx_events = self._uart_agent.rx_events
+                last = get_sim_time(units='ns')
+                quiet = 0
+            else:
+                quiet += 1
+        return round(last - start)
+
+    async def _saturation_sweep(self, channel_bits: int, test_log: SimLog) -> List[SweepPoint]:
+        """
+        Raises the event rate of the enabled channels step by step, counting the TDC events
+        the model expects from the triggers against the EVENT packets received
+        """
+        response: UartRxPckt = await self._uart_agent.transaction(
+            cmd=UartTxCmd.WRITE,
+            addr=RegAddr.CHANNEL_EN_BITS,
+            data=channel_bits
+        )
+        assert response.type == UartRxType.ACK_WRITE
+        channels = bin(channel_bits).count("1")
+
+        # past saturation the TDC drops pulses while busy, which its model does not know of
+        tdc_mmcs = [mmc for mmc in self._mmc_list if isinstance(mmc, TDCMMC)]
+        for mmc in tdc_mmcs:
+            mmc.stop()
+        fifo_full = [0]
+        fifo_watch: Optional[Task] = None
+        try:
+            fifo_watch = start_soon(self._count_fifo_full(self._dut.fifo_if.full, fifo_full))
+        except AttributeError:
+            test_log.warning("fifo_if.full not found, FIFO back-pressure is not counted")
+
+        limit_hz = self._uart_event_rate() / channels
+        poll_ns = round(1e9 / (limit_hz * channels * EVENT_PACKETS))
+        rng = stimulus_rng()
+        curve: List[SweepPoint] = []
+        for step in SWEEP_STEPS:
+            rate_hz = step * limit_hz
+            train = sipm_array_pulses([SiPMConfig(rate_hz=rate_hz)] * channels, SWEEP_EVENTS * 1e9 / rate_hz, rng)
+            expected = sum(len(outputs) for outputs in expected_tdc_outputs(train.pulses(), units=train.units).values())
+            rx_events = self._uart_agent.rx_events
+            fifo_full_before = fifo_full[0]
+
+            await self.trigger_agent.send_pulses(train.pulses(), units=train.units)
+            backlog_ns = await self._drain_events(poll_ns)
+            # the packets were counted, their queue is not read
+            await self._uart_agent.reset()
+
+            received = (self._uart_agent.rx_events - rx_events) // EVENT_PACKETS
+            curve.append(SweepPoint(
+                rate_hz=rate_hz,
+                triggers=len(train),
+                expected=expected,
+                received=received,
+                loss=1 - received / expected if expected else 0.0,
+                backlog_us=backlog_ns / 1000,
+                fifo_full=fifo_full[0] - fifo_full_before
+            ))
+
+        if fifo_watch is not None:
+            fifo_watch.kill()
+        for mmc in tdc_mmcs:
+            await mmc.reset()
+            mmc.start()
+        self._report_sweep(channels, limit_hz, curve, test_log)
+        return curve
+
+    def _report_sweep(self, channels: int, limit_hz: float, curve: List[SweepPoint], test_log: SimLog) -> None:
+        """Logs the rate vs loss curve and its saturation point, appends them to the VERIF_SWEEP JSON lines file"""
+        test_log.info("%i channel(s), UART limit %.0f events/s per channel", channels, limit_hz)
+        test_log.info("%12s %9s %9s %9s %8s %12s %10s", "rate (Hz)", "triggers", "expected", "received", "loss", "backlog (us)", "FIFO full")
+        for point in curve:
+            test_log.info(
+                "%12.0f %9i %9i %9i %7.1f%% %12.1f %10i",
+                point.rate_hz, point.triggers, point.expected, point.received,
+                100 * point.loss, point.backlog_us, point.fifo_full
+            )
+        sustained = [point.rate_hz for point in curve if point.loss <= LOSS_TOLERANCE]
+        saturation: Optional[float] = next((point.rate_hz for point in curve if point.loss > LOSS_TOLERANCE), None)
+        if saturation is None:
+            test_log.info("No saturation up to %.0f events/s per channel", curve[-1].rate_hz)
+        else:
+            test_log.info(
+                "Saturates at %.0f events/s per channel, %.0f events/s sustained",
+                saturation, max(sustained, default=0.0)
+            )
+        # runsim.py sets it next to the metrics, one JSON object per sweep
+        sweep_file = environ.get("VERIF_SWEEP")
+        if not sweep_file:
+            return
+        with open(sweep_file, "a") as sweep_lines:
+            sweep_lines.write(json.dumps(dict(
+                channels=channels,
+                uart_limit_hz=limit_hz,
+                sustained_hz=max(sustained, default=0.0),
+                saturation_hz=saturation,
+                curve=[asdict(point) for point in curve]
+            )) + "\n")
+
+    async def _test_SW_1(self) -> int:
+        # Initialise this test logger
+        test_name = "test_SW_1"
+        test_log = SimLog("cocotb.%s" % test_name)
+        test_log.info("Starting %s" % test_name)
+
+        # Saturation sweep of CH0 alone
+        curve = await self._saturation_sweep(0b01, test_log)
+
+        test_log.info("Finished %s" % test_name)
+        if(curve[0].loss > LOSS_TOLERANCE):
+            test_log.error("FAIL : CHAN0 lost events at %.0f events/s", curve[0].rate_hz)
+            return 1
+        else:
+            test_log.info("SUCCESS")
+            return 0
+
+    async def _test_SW_2(self) -> int:
+        # Initialise this test logger
+        test_name = "test_SW_2"
+        test_log = SimLog("cocotb.%s" % test_name)
+        test_log.info("Starting %s" % test_name)
+
+        # Saturation sweep of CH0 and CH1 together
+        curve = await self._saturation_sweep(0b11, test_log)
+
+        test_log.info("Finished %s" % test_name)
+        if(curve[0].loss > LOSS_TOLERANCE):
+            test_log.error("FAIL : CHAN0 and CHAN1 lost events at %.0f events/s each", curve[0].rate_hz)
+            return 1
+        else:
+            test_log.info("SUCCESS")
+            return 0
+
     async def _test_SD_1(self) -> int:
         # Initialise this test logger
         test_name = "test_SD_1"
@@ -311,6 +506,9 @@ class TDCEnvironment(BaseEnvironment):
             return 0
 
     def error_handling(self, logger):
+        # the outputs never produced only count once the scoreboards are flushed
+        self._mmc_list[0].finish()
+        self._mmc_list[1].finish()
         if(self._mmc_list[0].error_timestamp):
             logger.error("MMC FAIL : %i o_timestamp out of %i were wrong in CH0", self._mmc_list[0].error_timestamp, self._mmc_list[0].smp_count)
             self.tdc_error_count += self._mmc_list[0].error_timestamp
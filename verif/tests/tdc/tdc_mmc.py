@@ -3,14 +3,20 @@
 
 # adapted from https://github.com/cocotb/cocotb/blob/stable/1.9/examples/matrix_multiplier/tests/test_matrix_multiplier.py
 
-from typing import Dict, Tuple
+from typing import Optional, Tuple
 
+import numpy as np
 from cocotb.handle import SimHandleBase
+from cocotb.triggers import Timer
+from cocotb.utils import get_sim_time
 from base_monitor import BaseMonitor
 from base_mmc import BaseMMC
 from tdc.tdc_monitor import TDCInputMonitor, TDCOutputMonitor
 from base_model import BaseModel
 from base_uart_agent import TDCChannel
+from scoreboard import Scoreboard, Verdict
+
+LOOKAHEAD = 64  # most precomputed outputs queued in search of an unexpected o_timestamp
 
 
 class TDCMMC(BaseMMC):
@@ -19,7 +25,11 @@ class TDCMMC(BaseMMC):
         self.error_pulse_width: int = 0
         self.error_timestamp: int = 0
         self.smp_count = 0
+        self._precomputed: Optional[np.ndarray] = None
+        self._cursor: int = 0
         super(TDCMMC, self).__init__(model=model, logicblock_instance=logicblock_instance, logger_name=type(self).__qualname__+'.CHAN'+str(self._channel.value))
+        # outputs are matched by o_timestamp, a lost pulse does not shift the following ones
+        self._scoreboard = Scoreboard(self._log, fields=("o_pulseWidth",), group=lambda timestamp: self._channel.name)
 
     def _set_monitors(self) -> Tuple[BaseMonitor, BaseMonitor]:
         input_mon: BaseMonitor = TDCInputMonitor(
@@ -38,40 +48,103 @@ class TDCMMC(BaseMMC):
         )
         return input_mon, output_mon
 
+    def load_expected(self, expected: np.ndarray) -> None:
+        """
+        Checks the next outputs against precomputed (o_pulseWidth, o_timestamp) rows,
+        see tdc_model.expected_tdc_outputs. The input monitor sleeps until reset().
+        """
+        self._precomputed = expected
+        self._cursor = 0
+        if self._checkercoro is not None and self._input_mon._coro is not None:
+            self._input_mon.stop()
+
+    @property
+    def pending(self) -> int:
+        """Number of expected outputs not seen yet"""
+        if self._precomputed is None:
+            return len(self._scoreboard)
+        return len(self._scoreboard) + len(self._precomputed) - self._cursor
+
+    def _run_model(self, time_ps: int) -> None:
+        """Feeds the model every trigger edge seen so far, then lets time pass up to time_ps"""
+        while not self._input_mon.values.empty():
+            edge_time, level, _ = self._input_mon.values.get_nowait()
+            pulse = self._model.tdc.edge(edge_time, level)
+            if pulse is not None:
+                self._scoreboard.expect(pulse[1], pulse[:1])
+        pulse = self._model.tdc.advance(time_ps)
+        if pulse is not None:
+            self._scoreboard.expect(pulse[1], pulse[:1])
+
+    async def _expect_outputs(self, timestamp: int) -> None:
+        """Queues expected outputs until one with this o_timestamp is pending, or none is left to queue yet"""
+        if self._precomputed is not None:
+            end = min(self._cursor + LOOKAHEAD, len(self._precomputed))
+            while timestamp not in self._scoreboard and self._cursor < end:
+                model_pulse_width, model_timestamp = self._precomputed[self._cursor]
+                self._scoreboard.expect(int(model_timestamp), (int(model_pulse_width),))
+                self._cursor += 1
+            return
+
+        now = round(get_sim_time(units='ps'))
+        self._run_model(now)
+
+        # The pulse may still be in its debounce window, wait for it to settle
+        deadline = self._model.tdc.deadline
+        if timestamp not in self._scoreboard and deadline is not None:
+            await Timer(max(deadline - now, 1), units='ps')
+            self._run_model(deadline)
+
     # Insert logic to decide when to check the model against the HDL result.
     # then compare output monitor result with model result
     # This example might not work every time.
     async def _checker(self) -> None:
-        mon_samples: Dict[str, int] = {}
         self.smp_count = 0
         while True:
-            model_samples: tuple[int, int] = await self._model.tdc(
-                i_trig_rising=self._input_mon.i_trig_rising,
-                i_trig_falling=self._input_mon.i_trig_falling
-            )
-            model_pulse_width = hex(int(model_samples[0]))
-            model_timestamp = hex(int(model_samples[1]))
-            #self._log.info("%i. model_samples: o_pulseWidth = %s, o_timestamp = %s", self.smp_count, model_pulse_width, model_timestamp)
-
             mon_samples = await self._output_mon.values.get()
-            mon_pulse_width = hex(mon_samples["o_pulseWidth"])
-            mon_timestamp = hex(mon_samples["o_timestamp"])
-            
-            try:
-                self.smp_count+=1
-                assert model_pulse_width == mon_pulse_width
-            except AssertionError:
-                self._log.error("%i. monitor_samples: o_pulseWidth = %s", self.smp_count, mon_pulse_width)
-                self._log.error("%i. model_samples: o_pulseWidth = %s", self.smp_count, model_pulse_width)
+            self.smp_count+=1
+
+            await self._expect_outputs(mon_samples.o_timestamp)
+            verdict = self._scoreboard.actual(mon_samples.o_timestamp, (mon_samples.o_pulseWidth,))
+            if verdict is Verdict.EXTRA:
+                # no pulse was sent at that o_timestamp
                 self.error_pulse_width += 1
-            try:
-                assert model_timestamp == mon_timestamp
-            except AssertionError:
-                self._log.error("%i. monitor_samples: o_timestamp = %s", self.smp_count, mon_timestamp)
-                self._log.error("%i. model_samples: o_timestamp = %s", self.smp_count, model_timestamp)
                 self.error_timestamp += 1
+            elif verdict is Verdict.MISMATCH:
+                self.error_pulse_width += 1
+
+    def finish(self) -> int:
+        """
+        End of test check, to call before the verdict: every expected output the TDC
+        never produced is counted in error_timestamp. Returns their number.
+        """
+        missing = 0
+        if self._precomputed is not None:
+            missing = len(self._precomputed) - self._cursor
+            if missing:
+                self._log.error("%i precomputed outputs never came out of the TDC", missing)
+            self._cursor = len(self._precomputed)
+        else:
+            # a pulse still in its debounce window is not expected yet
+            self._run_model(round(get_sim_time(units='ps')))
+        missing += self._scoreboard.flush()
+        self.error_timestamp += missing
+        return missing
 
     async def reset(self) -> None:
+        await super(TDCMMC, self).reset()
+        if self._precomputed is not None:
+            never_queued = len(self._precomputed) - self._cursor
+            if never_queued:
+                self._log.error("%i precomputed outputs never came out of the TDC", never_queued)
+            self._precomputed = None
+            if self._checkercoro is not None and self._input_mon._coro is None:
+                self._input_mon.start()
+        # the edges seen before the reset were drained, so is the pulse in flight
+        self._model.tdc.reset()
+        self._scoreboard.flush()
+        self._scoreboard.report()
+        self._scoreboard.clear()
         self.smp_count = 0
         self.error_pulse_width = 0
         self.error_timestamp = 0
@@ -1,50 +1,50 @@
 from base_monitor import BaseMonitor
-from cocotb.triggers import Edge, RisingEdge, Event, ClockCycles
+from cocotb.triggers import Edge, RisingEdge, ClockCycles
 from cocotb.handle import SimHandleBase
+from cocotb.utils import get_sim_time
 from base_uart_agent import TDCChannel
 
 from typing import Dict
 
 class TDCInputMonitor(BaseMonitor):
+    TRACE_FIELDS = ("edge_ps", "level", "enable")
+
     def __init__(self, clk: SimHandleBase, trigger: SimHandleBase, reset: SimHandleBase, datas: Dict[str, SimHandleBase], channel: TDCChannel):
         self._channel = channel
         super(TDCInputMonitor, self).__init__(clk, datas, logger_name=type(self).__qualname__+'.CHAN'+str(self._channel.value))
         self._reset = reset
         self._trigger = trigger
-        self.i_trig_falling: Event = Event()
-        self.i_trig_rising: Event = Event()
-        self.i_trig_falling.clear()
-        self.i_trig_rising.clear()
+        self._enable = datas["i_enable_channel"]
 
     async def _run(self) -> None:
+        """Queues every i_trigger edge as (time in ps, level, enable), the TDC ignores the ones taken while disabled"""
         while True:
-            # self._log.info("waiting on i_trigger edge")
             await Edge(self._trigger)
-            # self._log.info("i_trigger edge detected")
-            
+            self.wakeups += 1
+
             if self._reset.value.binstr == '0':
-                if self.i_trig_rising.is_set():
-                    # self._log.info("i_trigger falling")
-                    self.i_trig_falling.set()
-                    self.i_trig_rising.clear()
-                else:
-                    # self._log.info("i_trigger rising")
-                    self.i_trig_rising.set()
-                    self.i_trig_falling.clear()
+                edge = (round(get_sim_time(units='ps')), int(self._trigger.value.binstr == '1'), int(self._enable.value.binstr == '1'))
+                if edge[2]:
+                    await self._store(edge)
+                elif self._trace is not None:
+                    # traced all the same, replay_tdc gates the driven edges with them
+                    self._trace.record(edge)
 
 class TDCOutputMonitor(BaseMonitor):
     def __init__(self, clk: SimHandleBase, has_event: SimHandleBase, datas: Dict[str, SimHandleBase], channel: TDCChannel, reset: SimHandleBase):
         self._channel = channel
         self._reset = reset
         self._has_event = has_event
-        super(TDCOutputMonitor, self).__init__(clk, datas, logger_name=type(self).__qualname__+'.CHAN'+str(self._channel.value))
+        super(TDCOutputMonitor, self).__init__(clk, datas, logger_name=type(self).__qualname__+'.CHAN'+str(self._channel.value), records=True)
 
     async def _run(self) -> None:
         while True:
             await RisingEdge(self._has_event)
+            self.wakeups += 1
             
             await ClockCycles(self._clk, num_cycles=1, rising=True)
+            self.wakeups += 1
             
             # self._log.info("o_hasEvent detected")
 
-            self.values.put_nowait(self._sample())
+            await self._store(self._sample())